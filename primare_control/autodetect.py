@@ -0,0 +1,188 @@
+"""Detect the serial port and baudrate of connected Primare amplifiers.
+
+All candidate serial ports are scanned concurrently. On each port the
+baudrates are tried in order of likelihood with a single modelname_get
+probe, waiting only as long as the probe and its reply take to transfer at
+that baudrate. Detection ends as soon as one amplifier answers, without
+waiting for the scans of silent ports. The result is cached, so later runs
+can try the known-good settings before scanning again.
+"""
+
+from __future__ import with_statement
+
+import collections
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from .input_index import default_path as inputs_path
+    from .primare_control import PrimareController, PrimareTimeoutError
+except (ImportError, ValueError):
+    # Imported as a top level module when primare_interface.py is run as a
+    # script from within the package directory
+    from input_index import default_path as inputs_path
+    from primare_control import PrimareController, PrimareTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Most likely first, the I22 only supports 4800
+BAUDRATES = [4800, 9600, 19200, 2400, 57600, 115200, 1200, 300]
+
+# Serial ports to try besides those listed by pyserial
+PORT_PATTERNS = [
+    '/dev/ttyUSB*',
+    '/dev/ttyACM*',
+    '/dev/ttyAMA*',
+    '/dev/ttyATH*',
+    '/dev/cu.usbserial*',
+]
+
+# Bytes transferred by a probe: the request plus a generous model name reply
+PROBE_BYTES = 32
+# Seconds the amplifier may take to answer on top of the transfer time
+PROBE_MARGIN = 0.1
+
+Detection = collections.namedtuple('Detection',
+                                   ['port', 'baudrate', 'model'])
+
+
+def default_path():
+    """Return the default location of the detection cache file."""
+    return os.path.join(os.path.dirname(inputs_path()), 'detect.json')
+
+
+def candidate_ports():
+    """Return the serial ports which may have an amplifier connected."""
+    ports = []
+    try:
+        from serial.tools import list_ports
+        ports.extend(port.device for port in list_ports.comports())
+    except ImportError:
+        pass
+    for pattern in PORT_PATTERNS:
+        ports.extend(sorted(glob.glob(pattern)))
+    # Remove duplicates, keeping the order
+    seen = set()
+    return [port for port in ports if not (port in seen or seen.add(port))]
+
+
+def probe_timeout(baudrate):
+    """Return the seconds to wait for a probe reply at baudrate.
+
+    Each byte takes 10 bit times: start bit, 8 data bits and stop bit.
+    """
+    return PROBE_BYTES * 10.0 / baudrate + PROBE_MARGIN
+
+
+def probe(port, baudrate):
+    """Return the model name of the amplifier at port and baudrate or None.
+
+    At a wrong baudrate the amplifier's replies are garbage, so the probe
+    uses a throwaway input name cache rather than the user's.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        try:
+            controller = PrimareController(
+                port=port, baudrate=baudrate, timeout=probe_timeout(baudrate),
+                inputs_file=os.path.join(directory, 'inputs.json'))
+        except Exception as e:
+            logger.debug("Cannot open %s: %s", port, e)
+            return None
+        try:
+            return controller.modelname_get().result() or None
+        except PrimareTimeoutError:
+            return None
+        finally:
+            controller.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def scan_port(port, baudrates=BAUDRATES, stop=None):
+    """Return the Detection for port, or None if no amplifier answers.
+
+    The scan gives up before the next baudrate once the threading.Event
+    stop is set.
+    """
+    for baudrate in baudrates:
+        if stop is not None and stop.is_set():
+            return None
+        model = probe(port, baudrate)
+        if model:
+            logger.info("Found %s on %s at %d baud", model, port, baudrate)
+            return Detection(port, baudrate, model)
+    return None
+
+
+def detect(ports=None, baudrates=BAUDRATES):
+    """Scan ports concurrently, return a list of Detection.
+
+    The list holds the first amplifier found, or is empty if none answers.
+    The scans of the other ports are stopped, but not waited for.
+    """
+    if ports is None:
+        ports = candidate_ports()
+    if not ports:
+        return []
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(ports))
+    try:
+        scans = [executor.submit(scan_port, port, baudrates, stop)
+                 for port in ports]
+        for scan in as_completed(scans):
+            if scan.result() is not None:
+                return [scan.result()]
+        return []
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def load_cached(path=None):
+    """Return the cached Detection, or None."""
+    try:
+        with open(path or default_path()) as fh:
+            cached = json.load(fh)
+        return Detection(cached['port'], int(cached['baudrate']),
+                         cached['model'])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached(detection, path=None):
+    """Store detection in the cache file."""
+    path = path or default_path()
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as fh:
+            json.dump(detection._asdict(), fh, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        logger.warning("Could not save detection cache %s: %s", path, e)
+
+
+def detect_cached(path=None, ports=None, baudrates=BAUDRATES):
+    """Return a list of Detection, trying the cached settings first.
+
+    A full scan is only done if the cached amplifier no longer answers, and
+    its first result is cached.
+    """
+    cached = load_cached(path)
+    if cached is not None:
+        model = probe(cached.port, cached.baudrate)
+        if model:
+            return [Detection(cached.port, cached.baudrate, model)]
+        logger.info("Cached amplifier on %s does not answer, scanning",
+                    cached.port)
+    detections = detect(ports, baudrates)
+    if detections:
+        save_cached(detections[0], path)
+    return detections
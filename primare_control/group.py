@@ -0,0 +1,141 @@
+"""Groups of Primare amplifiers controlled as one.
+
+A PrimareGroup sends a command to all its amplifiers at effectively the same
+moment: the frame is encoded once and written to every link from a single
+call in the reactor thread, followed by a single pacing pause for the whole
+group instead of one per amplifier. The reply of each amplifier is tracked,
+and the skew between the first and the last acknowledgment is reported so
+it can be measured and kept small.
+"""
+
+from __future__ import with_statement
+
+import collections
+import logging
+import time
+
+from concurrent.futures import Future
+
+try:
+    from .primare_control import (WRITE_PACING, _after_all, _command_data,
+                                  _encode_frame)
+    from .timings import TIMINGS, clock
+except (ImportError, ValueError):
+    # Imported as a top level module when primare_interface.py is run as a
+    # script from within the package directory
+    from primare_control import (WRITE_PACING, _after_all, _command_data,
+                                 _encode_frame)
+    from timings import TIMINGS, clock
+
+logger = logging.getLogger(__name__)
+
+# Result of a group command, with one entry per amplifier in replies (the
+# reply value or the exception) and acked_at (clock() when the amplifier
+# acknowledged, None if it failed). Skew is the time between the first and
+# the last acknowledgment.
+GroupReply = collections.namedtuple('GroupReply',
+                                    ['replies', 'acked_at', 'skew'])
+
+
+class PrimareGroup(object):
+    """Send the same commands to several PrimareControllers at once.
+
+    Commands return a future resolving with a GroupReply once every
+    amplifier replied or timed out. Commands the amplifier does not reply to,
+    like power_on, count as acknowledged when written.
+    """
+
+    def __init__(self, controllers):
+        """Group the given, already opened, controllers.
+
+        The controllers must share one I/O runtime, frames are written from
+        the reactor thread of the first.
+        """
+        self._controllers = list(controllers)
+        if not self._controllers:
+            raise ValueError('A group needs at least one controller')
+        self._reactor = self._controllers[0]._runtime.reactor
+
+    def _write_all(self, frame, written_at, written):
+        """Write frame to every link, runs in the reactor thread.
+
+        Stops at the first link failing, the amplifiers not written to time
+        out.
+        """
+        try:
+            for controller in self._controllers:
+                controller._serial_protocol.sendLine(frame)
+                written_at.append(clock())
+        except Exception as e:
+            logger.error('Group write failed: %s', e)
+            written.set_exception(e)
+        else:
+            written.set_result(None)
+
+    def _send_command(self, variable, option=None):
+        command, data = _command_data(variable, option)
+        frame = _encode_frame(command, data)
+        # Group commands are all writes, so they are never shared
+        futures = [controller._register_command(variable, option)[0]
+                   for controller in self._controllers]
+
+        written = Future()
+        written.set_running_or_notify_cancel()
+        written_at = []
+        replied_at = [None] * len(futures)
+
+        def replied(index, future):
+            if future.exception() is None:
+                replied_at[index] = clock()
+        for index, future in enumerate(futures):
+            future.add_done_callback(
+                lambda future, index=index: replied(index, future))
+
+        def result():
+            replies = [future.exception() or future.result()
+                       for future in futures]
+            # Commands without a reply resolve before they are written
+            acked_at = [None if reply_time is None or index >= len(written_at)
+                        else max(reply_time, written_at[index])
+                        for index, reply_time in enumerate(replied_at)]
+            times = [acked for acked in acked_at if acked is not None]
+            skew = max(times) - min(times) if times else None
+            logger.debug('Group %s: skew %s', variable, skew)
+            return GroupReply(replies, acked_at, skew)
+
+        logger.debug('Group _send_command(%s), data: "%s"', variable, data)
+        self._reactor.callFromThread(self._write_all, frame, written_at,
+                                     written)
+        with TIMINGS.phase('write pacing sleep'):
+            time.sleep(WRITE_PACING)
+        return _after_all(futures + [written], result)
+
+    def power_on(self):
+        """Power on all amplifiers."""
+        return self._send_command('power_set', '01')
+
+    def power_off(self):
+        """Power off all amplifiers."""
+        return self._send_command('power_set', '00')
+
+    def volume_set(self, volume):
+        """Set volume level of all amplifiers, range is 0-79."""
+        return self._send_command('volume_set', '{:02X}'.format(
+            volume if volume < 80 else 0x4F))
+
+    def volume_up(self):
+        """Increase volume of all amplifiers by one step."""
+        return self._send_command('volume_up')
+
+    def volume_down(self):
+        """Decrease volume of all amplifiers by one step."""
+        return self._send_command('volume_down')
+
+    def mute_set(self, mute):
+        """Enable or disable mute on all amplifiers."""
+        return self._send_command('mute_set', '01' if mute is True else '00')
+
+    def input_set(self, source):
+        """Set the current input number of all amplifiers."""
+        return self._send_command('input_set',
+                                  '{:02X}'.format(int(source) % 13))
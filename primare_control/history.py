@@ -0,0 +1,191 @@
+"""Append only history of amplifier state changes.
+
+Every change of a numeric state variable (power, input, volume, ...) is
+stored as a fixed size record of timestamp, variable and value. Records are
+buffered and written in batches, so a burst of verbose replies while the
+volume knob is turned costs one write and fsync, not one per frame. The
+file is rotated once it grows beyond a size limit.
+
+Queries scan a time range of the current and rotated files through mmap and
+return columnar arrays, which can be handed to NumPy without copying, e.g.
+numpy.frombuffer(columns['time']).
+"""
+
+from __future__ import with_statement
+
+import array
+import mmap
+import os
+import struct
+import time
+
+# Record layout, little endian: timestamp (d), variable (B), value (i)
+RECORD = struct.Struct('<dBi')
+
+# Variables which are stored, with the variable byte used by the amplifier
+VARIABLES = {
+    'power': 0x01,
+    'input': 0x02,
+    'volume': 0x03,
+    'balance': 0x04,
+    'mute': 0x09,
+    'dim': 0x0a,
+    'verbose': 0x0d,
+    'menu': 0x0e,
+    'ir_input': 0x12,
+}
+VARIABLE_NAMES = dict((code, name) for name, code in VARIABLES.items())
+
+# Defaults for rotation and batching
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+BATCH_RECORDS = 256
+FLUSH_INTERVAL = 5.0
+
+
+class HistoryWriter(object):
+    """Buffer state changes and append them to a history file in batches."""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                 batch_records=BATCH_RECORDS, fsync=True):
+        """Open the history file at path for appending."""
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._batch_bytes = batch_records * RECORD.size
+        self._fsync = fsync
+        self._buffer = bytearray()
+        self._last_time = 0.0
+        self._file = self._open()
+
+    def append(self, name, value, timestamp=None):
+        """Buffer a change of variable name to value.
+
+        Variables which are not numeric, e.g. input names, are not stored.
+        Timestamps never decrease, even if the wall clock is set back, as
+        query relies on the records being in time order.
+        Returns True if the record starts a new batch, in which case the
+        caller should make sure flush is called within FLUSH_INTERVAL.
+        """
+        code = VARIABLES.get(name)
+        if code is None or value is None:
+            return False
+        starts_batch = not self._buffer
+        if timestamp is None:
+            timestamp = time.time()
+        self._last_time = max(timestamp, self._last_time)
+        self._buffer += RECORD.pack(self._last_time, code, int(value))
+        if len(self._buffer) >= self._batch_bytes:
+            self.flush()
+            return False
+        return starts_batch
+
+    def _open(self):
+        fh = open(self._path, 'ab')
+        size = os.fstat(fh.fileno()).st_size
+        # Drop a record torn by a crash while writing, later records would
+        # be misaligned otherwise
+        if size % RECORD.size:
+            size -= size % RECORD.size
+            fh.truncate(size)
+            fh.seek(0, os.SEEK_END)
+        if size:
+            with open(self._path, 'rb') as last:
+                last.seek(size - RECORD.size)
+                self._last_time = max(
+                    RECORD.unpack(last.read(RECORD.size))[0],
+                    self._last_time)
+        return fh
+
+    def flush(self):
+        """Write buffered records to disk, rotating the file if needed."""
+        if not self._buffer:
+            return
+        size = self._file.tell()
+        if size and size + len(self._buffer) > self._max_bytes:
+            self._rotate()
+        self._file.write(self._buffer)
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+        del self._buffer[:]
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self._backup_count - 1, 0, -1):
+            source = '{}.{}'.format(self._path, index)
+            if os.path.exists(source):
+                os.rename(source, '{}.{}'.format(self._path, index + 1))
+        if self._backup_count:
+            os.rename(self._path, self._path + '.1')
+        else:
+            os.remove(self._path)
+        self._file = self._open()
+
+    def close(self):
+        """Flush buffered records and close the history file."""
+        self.flush()
+        self._file.close()
+
+
+def _history_files(path):
+    """Return the existing history files, oldest first."""
+    files = []
+    index = 1
+    while os.path.exists('{}.{}'.format(path, index)):
+        files.insert(0, '{}.{}'.format(path, index))
+        index += 1
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def _first_record_at(data, count, start):
+    """Return the index of the first of count records at or after start."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if RECORD.unpack_from(data, middle * RECORD.size)[0] < start:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def query(path, start=None, end=None, variables=None):
+    """Return the state changes between start and end as columns.
+
+    Start and end are Unix timestamps, None means unbounded. Variables is a
+    list of variable names to include, None means all. The result is a dict
+    of array.array with the keys 'time' (float seconds), 'variable' (the
+    amplifier's variable byte, see VARIABLE_NAMES) and 'value'.
+    """
+    codes = None
+    if variables is not None:
+        codes = set(VARIABLES[name] for name in variables)
+    columns = {'time': array.array('d'),
+               'variable': array.array('B'),
+               'value': array.array('i')}
+    for filename in _history_files(path):
+        with open(filename, 'rb') as fh:
+            count = os.fstat(fh.fileno()).st_size // RECORD.size
+            if not count:
+                continue
+            data = mmap.mmap(fh.fileno(), count * RECORD.size,
+                             access=mmap.ACCESS_READ)
+        try:
+            index = 0 if start is None else _first_record_at(data, count,
+                                                             start)
+            for offset in range(index * RECORD.size, count * RECORD.size,
+                                RECORD.size):
+                timestamp, code, value = RECORD.unpack_from(data, offset)
+                if end is not None and timestamp > end:
+                    # Later records and files are all newer
+                    return columns
+                if codes is None or code in codes:
+                    columns['time'].append(timestamp)
+                    columns['variable'].append(code)
+                    columns['value'].append(value)
+        finally:
+            data.close()
+    return columns
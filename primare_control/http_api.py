@@ -0,0 +1,311 @@
+"""HTTP API for the state of a Primare amplifier.
+
+Serves the state cached by a PrimareController, so dashboards can poll it
+without opening the serial port:
+
+ GET  /state                   state as JSON, with an ETag of the state
+                               version, 304 if If-None-Match still matches
+ GET  /state/poll?version=V    long-poll, answers once the version differs
+                               from V (or If-None-Match), 304 on timeout
+ POST /command/<name>          run one of COMMANDS, the value is given as
+                               ?value=, form field or JSON object body
+
+Versions combine a random epoch of the server process with the state
+version of the controller, so a version seen before a restart of the
+server never matches the state after it.
+
+Everything runs on the reactor of the controller's I/O runtime. Waiting
+long-polls are parked requests, not threads, so many idle dashboards cost
+next to nothing. Commands run in the reactor's thread pool as they block
+while pacing writes.
+"""
+
+from __future__ import with_statement
+
+import binascii
+import json
+import logging
+import os
+
+from twisted.internet.threads import deferToThreadPool
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+
+try:
+    from .primare_control import PrimareTimeoutError
+except (ImportError, ValueError):
+    # Imported as a top level module when primare_interface.py is run as a
+    # script from within the package directory
+    from primare_control import PrimareTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Seconds a long-poll waits for a change before answering 304
+LONG_POLL_TIMEOUT = 30
+
+# PrimareController methods which may be run over HTTP. Anything else, e.g.
+# recall_factory_settings or turning verbose mode off, is left to the CLI.
+COMMANDS = [
+    'power_on',
+    'power_off',
+    'power_toggle',
+    'input_set',
+    'input_next',
+    'input_prev',
+    'volume_get',
+    'volume_set',
+    'volume_up',
+    'volume_down',
+    'balance_adjust_left',
+    'balance_adjust_right',
+    'balance_set',
+    'mute_toggle',
+    'mute_set',
+    'dim_cycle',
+    'dim_set',
+    'inputname_current_get',
+    'manufacturer_get',
+    'modelname_get',
+    'swversion_get'
+]
+
+# Commands taking an on/off value, which the controller only takes as bool
+BOOLEAN_COMMANDS = ['mute_set']
+
+BOOLEANS = {
+    '1': True,
+    'true': True,
+    'on': True,
+    'yes': True,
+    '0': False,
+    'false': False,
+    'off': False,
+    'no': False,
+}
+
+# Random for every process serving the API
+EPOCH = binascii.hexlify(os.urandom(4)).decode('ascii')
+
+
+def _version(controller):
+    return '{}-{}'.format(EPOCH, controller._state_version)
+
+
+def _etag(version):
+    return '"{}"'.format(version).encode('ascii')
+
+
+def _write_json(request, body, code=200):
+    request.setResponseCode(code)
+    request.setHeader(b'Content-Type', b'application/json')
+    request.setHeader(b'Cache-Control', b'no-cache')
+    return json.dumps(body, sort_keys=True).encode('utf-8')
+
+
+def _requested_version(request):
+    """Return the state version the client has, or None."""
+    version = request.args.get(b'version')
+    if version:
+        return _etag(version[0].decode('ascii', 'replace'))
+    return request.getHeader(b'if-none-match')
+
+
+def _parse_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _parse_bool(value):
+    """Return value, e.g. 1, 'on' or true from JSON, as bool."""
+    if isinstance(value, bool):
+        return value
+    try:
+        return BOOLEANS[str(value).strip().lower()]
+    except KeyError:
+        raise ValueError('Not an on/off value: {}'.format(value))
+
+
+class StateResource(Resource):
+    """Current state of the amplifier with ETag support."""
+
+    def __init__(self, controller):
+        """Initialization."""
+        Resource.__init__(self)
+        self._controller = controller
+
+    def render_GET(self, request):
+        """Return the state, or 304 if the client's version is current."""
+        version = _version(self._controller)
+        request.setHeader(b'ETag', _etag(version))
+        if request.getHeader(b'if-none-match') == _etag(version):
+            request.setResponseCode(304)
+            return b''
+        return _write_json(request, {'version': version,
+                                     'state': self._controller._state})
+
+
+class PollResource(Resource):
+    """Long-poll for the next change of the amplifier state."""
+
+    isLeaf = True
+
+    def __init__(self, controller, timeout=LONG_POLL_TIMEOUT):
+        """Initialization."""
+        Resource.__init__(self)
+        self._controller = controller
+        self._timeout = timeout
+        self._waiting = []
+
+    def start(self):
+        """Start answering long-polls on changes of the state."""
+        self._controller._state_listeners.append(self._state_changed)
+
+    def stop(self):
+        """Stop following the state, so the controller can be served again."""
+        self._controller._state_listeners.remove(self._state_changed)
+
+    def render_GET(self, request):
+        """Answer now if the state changed, otherwise park the request."""
+        if _requested_version(request) != _etag(_version(self._controller)):
+            return self._answer(request)
+
+        timer = self._controller._runtime.reactor.callLater(
+            self._timeout, self._expire, request)
+        self._waiting.append(request)
+
+        def gone(_):
+            # Client went away or the request was answered
+            if timer.active():
+                timer.cancel()
+            if request in self._waiting:
+                self._waiting.remove(request)
+        request.notifyFinish().addBoth(gone)
+        return NOT_DONE_YET
+
+    def _answer(self, request):
+        version = _version(self._controller)
+        request.setHeader(b'ETag', _etag(version))
+        return _write_json(request, {'version': version,
+                                     'state': self._controller._state})
+
+    def _expire(self, request):
+        if request in self._waiting:
+            self._waiting.remove(request)
+            request.setResponseCode(304)
+            request.finish()
+
+    def _state_changed(self, version):
+        waiting, self._waiting = self._waiting, []
+        for request in waiting:
+            request.write(self._answer(request))
+            request.finish()
+
+
+class CommandResource(Resource):
+    """Run PrimareController commands."""
+
+    isLeaf = True
+
+    def __init__(self, controller):
+        """Initialization."""
+        Resource.__init__(self)
+        self._controller = controller
+
+    def _command(self, name):
+        if name not in COMMANDS:
+            return None
+        return getattr(self._controller, name, None)
+
+    def _value(self, request):
+        value = request.args.get(b'value')
+        if value:
+            return _parse_value(value[0].decode('utf-8'))
+        body = request.content.read()
+        if body:
+            body = json.loads(body.decode('utf-8'))
+            if not isinstance(body, dict):
+                raise ValueError('JSON body must be an object')
+            return body.get('value')
+        return None
+
+    def render_POST(self, request):
+        """Run the command and answer with the reply from the amplifier."""
+        name = b'/'.join(request.postpath).decode('ascii', 'replace')
+        command = self._command(name)
+        if command is None:
+            return _write_json(request, {'error': 'Unknown command'}, 404)
+        try:
+            value = self._value(request)
+            if value is not None and name in BOOLEAN_COMMANDS:
+                value = _parse_bool(value)
+        except ValueError as e:
+            return _write_json(request, {'error': str(e)}, 400)
+        args = () if value is None else (value,)
+
+        def run():
+            # Runs in the thread pool, commands block while pacing writes
+            future = command(*args)
+            return future.result() if future is not None else None
+
+        def answer(body, code=200):
+            if not disconnected:
+                request.write(_write_json(request, body, code))
+                request.finish()
+
+        def failed(failure):
+            code = 500
+            if failure.check(PrimareTimeoutError):
+                code = 504
+            elif failure.check(ValueError, TypeError, KeyError):
+                # Bad value or unknown input name given by the client
+                code = 400
+            logger.warning("HTTP command %s failed: %s", name,
+                           failure.getTraceback() if code == 500 else
+                           failure.getErrorMessage())
+            answer({'error': failure.getErrorMessage()}, code)
+
+        disconnected = []
+        request.notifyFinish().addErrback(
+            lambda _: disconnected.append(True))
+        reactor = self._controller._runtime.reactor
+        deferred = deferToThreadPool(reactor, reactor.getThreadPool(), run)
+        deferred.addCallbacks(
+            lambda reply: answer({'command': name, 'reply': reply}), failed)
+        return NOT_DONE_YET
+
+
+class ApiSite(Site):
+    """Site serving the API of a controller while it is listening."""
+
+    def __init__(self, controller):
+        """Initialization."""
+        self._poll = PollResource(controller)
+        state = StateResource(controller)
+        state.putChild(b'poll', self._poll)
+        root = Resource()
+        root.putChild(b'state', state)
+        root.putChild(b'command', CommandResource(controller))
+        Site.__init__(self, root)
+
+    def startFactory(self):
+        """Follow the state of the controller once listening."""
+        Site.startFactory(self)
+        self._poll.start()
+
+    def stopFactory(self):
+        """Stop following the state once no longer listening."""
+        self._poll.stop()
+        Site.stopFactory(self)
+
+
+def make_site(controller):
+    """Return a twisted.web Site serving the API of controller."""
+    return ApiSite(controller)
+
+
+def listen(controller, port, interface='127.0.0.1'):
+    """Serve the API of controller on port, call in the reactor thread."""
+    return controller._runtime.reactor.listenTCP(port, make_site(controller),
+                                                 interface=interface)
@@ -0,0 +1,106 @@
+"""Index of the input names configured on a Primare amplifier.
+
+Input names can be changed on the amplifier, but rarely are. The index keeps
+the names in a JSON cache file so input numbers can be resolved from names
+without asking the amplifier, and is updated whenever the amplifier reports
+a name that differs from the cached one.
+"""
+
+from __future__ import with_statement
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def default_path():
+    """Return the default location of the input name cache file."""
+    directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(directory, 'primare_control', 'inputs.json')
+
+
+def _normalize(name):
+    return name.strip().lower()
+
+
+class InputNameIndex(object):
+    """Map input numbers to names and back.
+
+    The cache file may hold several amplifiers, each stored under its own
+    key (the serial port used to reach it).
+    """
+
+    def __init__(self, path=None, key='default'):
+        """Load the names stored for key in the cache file at path."""
+        self._path = path or default_path()
+        self._key = str(key)
+        self._names = {}
+        self._numbers = {}
+        for number, name in self._load().get(self._key, {}).items():
+            self._set(int(number), name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _load(self):
+        try:
+            with open(self._path) as fh:
+                return json.load(fh)
+        except (IOError, OSError):
+            return {}
+        except ValueError as e:
+            logger.warning("Ignoring corrupt input name cache %s: %s",
+                           self._path, e)
+            return {}
+
+    def _save(self):
+        cache = self._load()
+        cache[self._key] = dict((str(number), name) for number, name in
+                                self._names.items())
+        directory = os.path.dirname(self._path)
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self._path, 'w') as fh:
+                json.dump(cache, fh, indent=2, sort_keys=True)
+        except (IOError, OSError) as e:
+            logger.warning("Could not save input name cache %s: %s",
+                           self._path, e)
+
+    def _set(self, number, name):
+        old_name = self._names.get(number)
+        if old_name is not None:
+            self._numbers.pop(_normalize(old_name), None)
+        self._names[number] = name
+        self._numbers[_normalize(name)] = number
+
+    def names(self):
+        """Return a dict of input number to input name."""
+        return dict(self._names)
+
+    def update(self, number, name):
+        """Store the name of input number.
+
+        The cache file is only rewritten if the name changed. Returns True
+        if it did.
+        """
+        if self._names.get(number) == name:
+            return False
+        logger.debug("Input %d is named '%s'", number, name)
+        self._set(number, name)
+        self._save()
+        return True
+
+    def resolve(self, source):
+        """Return the input number for source.
+
+        Source is either an input number or an input name, names are matched
+        case insensitively. Raises KeyError for unknown names.
+        """
+        try:
+            return int(source)
+        except ValueError:
+            return self._numbers[_normalize(source)]
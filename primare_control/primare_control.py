@@ -8,14 +8,37 @@ amplifier.
 from __future__ import with_statement
 
 import binascii
+import functools
 import logging
 import struct
+import threading
 import time
 
-from threading import Thread
-from twisted.internet import reactor
-from twisted.internet.serialport import SerialPort
-from twisted.protocols.basic import LineReceiver
+from collections import Counter, deque
+from concurrent.futures import Future
+
+try:
+    from .history import FLUSH_INTERVAL, HistoryWriter
+    from .input_index import InputNameIndex
+    from .state_snapshot import StateSnapshotWriter
+    from .timings import TIMINGS, clock
+except (ImportError, ValueError):
+    # Imported as a top level module when primare_interface.py is run as a
+    # script from within the package directory
+    from history import FLUSH_INTERVAL, HistoryWriter
+    from input_index import InputNameIndex
+    from state_snapshot import StateSnapshotWriter
+    from timings import TIMINGS, clock
+
+with TIMINGS.phase('import twisted'):
+    from twisted.internet import defer
+    from twisted.protocols.basic import LineReceiver
+    try:
+        from .runtime import RUNTIME
+        from .transport import open_transport
+    except (ImportError, ValueError):
+        from runtime import RUNTIME
+        from transport import open_transport
 
 # from twisted.logger import Logger
 #
@@ -66,10 +89,11 @@ POS_DLE_ETX = slice(-2, None)
 POS_CMD_VAR = slice(2, 3)
 POS_REPLY_VAR = slice(1, 2)
 POS_REPLY_DATA = slice(2, None)
-BYTE_STX = '\x02'
-BYTE_WRITE = '\x57'
-BYTE_READ = '\x52'
-BYTE_DLE_ETX = '\x10\x03'
+BYTE_STX = b'\x02'
+BYTE_WRITE = b'\x57'
+BYTE_READ = b'\x52'
+BYTE_DLE = b'\x10'
+BYTE_DLE_ETX = b'\x10\x03'
 
 INDEX_CMD = 0
 INDEX_VARIABLE = 1
@@ -107,6 +131,28 @@ PRIMARE_CMD = {
     'swversion_get': ['R', '1700', '17', True]
 }
 
+# Seconds to wait for the reply to a command before the future returned by
+# _send_command fails with PrimareTimeoutError
+REPLY_TIMEOUT = 1.0
+
+# Seconds to pause after each frame written
+WRITE_PACING = 0.05
+
+# Bytes transferred by a command and its reply, the late reply to an expired
+# write is only expected within the time these take at the baudrate
+LATE_REPLY_BYTES = 32
+
+# Commands which only read from the amplifier. Identical reads outstanding
+# at the same time share one frame on the link.
+PRIMARE_READS = [
+    'volume_get',
+    'inputname_current_get',
+    'inputname_specific_get',
+    'manufacturer_get',
+    'modelname_get',
+    'swversion_get'
+]
+
 PRIMARE_REPLY = {
     '01': 'power',
     '02': 'input',
@@ -143,6 +189,109 @@ PRIMARE_REPLY = {
 # * ...
 
 
+class PrimareTimeoutError(Exception):
+    """The amplifier did not reply to a command in time."""
+
+
+def _split_inputname(data):
+    """Split an input name reply into input number and name.
+
+    The amplifier prefixes the name with the input number, a byte which is
+    never a printable character. Returns None as input number if the reply
+    carries no such prefix.
+    """
+    if len(data) >= 2 and int(data[0:2], 16) < 0x20:
+        return int(data[0:2], 16), data[2:]
+    return None, data
+
+
+def _reply_value(variable_char, data):
+    """Convert the hex encoded data of a reply to a Python value.
+
+    On/off variables become bool, numeric variables int (balance is signed)
+    and names are returned as text.
+    """
+    name = PRIMARE_REPLY.get(variable_char)
+    if not data:
+        return None
+    if name in ['power', 'mute', 'verbose', 'ir_input']:
+        return int(data[0:2], 16) != 0
+    elif name in ['input', 'volume', 'dim', 'menu']:
+        if variable_char == '94':
+            return _reply_value('14', data)
+        return int(data[0:2], 16)
+    elif name == 'balance':
+        return struct.unpack('b', binascii.unhexlify(data[0:2]))[0]
+    elif name == 'inputname':
+        data = _split_inputname(data)[1]
+    return binascii.unhexlify(data).decode('ascii', 'replace')
+
+
+def _resolved(value=None):
+    """Return a future which is already resolved with value."""
+    future = Future()
+    future.set_running_or_notify_cancel()
+    future.set_result(value)
+    return future
+
+
+def _after_all(futures, result):
+    """Return a future resolving with result() once all futures are done.
+
+    Failures of the individual futures are ignored.
+    """
+    combined = Future()
+    combined.set_running_or_notify_cancel()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result(result())
+
+    if not futures:
+        combined.set_result(result())
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+def _command_data(variable, option=None):
+    """Return the command type and hex data of a PRIMARE_CMD command."""
+    data = PRIMARE_CMD[variable][INDEX_VARIABLE]
+    if option is not None:
+        data = data.replace('YY', option)
+    return PRIMARE_CMD[variable][INDEX_CMD], data
+
+
+def _encode_frame(cmd_type, data):
+    r"""Return the binary frame for a command with hex encoded data.
+
+    Any occurences of '\x10' must be replaced with '\x10\x10' and add
+    the STX and DLE+ETX markers
+    """
+    # We need to replace single DLE (0x10) with double DLE
+    # Seems redundant as there is no '0x10' command, and we only have one
+    # variable that could be 0x10, followed by 0x10 0x03
+    data_safe = ''
+    for index in range(0, len(data) - 1, 2):
+        pair = data[index:index + 2]
+        if pair == '10':
+            data_safe += '1010'
+        else:
+            data_safe += pair
+    # Convert ascii string to binary
+    binary_variable = binascii.unhexlify(data_safe)
+
+    binary_data = BYTE_STX
+    binary_data += BYTE_WRITE if cmd_type == 'W' else BYTE_READ
+    binary_data += binary_variable + BYTE_DLE_ETX
+    return binary_data
+
+
 class PrimareProtocol(LineReceiver):
     """Primare serial communication protocol."""
 
@@ -153,6 +302,7 @@ class PrimareProtocol(LineReceiver):
         """
         self._debug = debug
         self._primare_talker = primare_talker
+        self._disconnected = defer.Deferred()
         self.delimiter = BYTE_DLE_ETX
 
     def connectionMade(self):
@@ -166,30 +316,92 @@ class PrimareProtocol(LineReceiver):
             logger.debug("Lost connection to Primare due to '{}'".format(
                 reason.getErrorMessage()))
         self._primare_talker = None
+        self._disconnected.callback(None)
+
+    def disconnect(self):
+        """Close the transport, return a Deferred firing once it is closed."""
+        if self.transport is not None and not self._disconnected.called:
+            self.transport.loseConnection()
+        return self._disconnected
 
     def lineReceived(self, data):
-        """Handle each line received by Twisted's SerialPort."""
+        """Handle each line received by the transport."""
         if self._debug:
             logger.debug("Serial LineRX({}): '{}'".format(len(data), data))
-        self._primare_talker._primare_reader(data)
+        if self._primare_talker is not None:
+            self._primare_talker._primare_reader(data)
 
 
 class PrimareController():
-    """This class provides methods for controlling a Primare amplifier."""
+    """This class provides methods for controlling a Primare amplifier.
+
+    Every command returns a concurrent.futures.Future which resolves with the
+    value of the reply from the amplifier, or fails with PrimareTimeoutError
+    if the amplifier does not answer within `timeout` seconds. Commands to
+    different variables may be outstanding at the same time, while identical
+    reads outstanding at the same time are sent only once and share the
+    reply. Counts of frames sent and saved, replies and timeouts are kept in
+    `metrics`.
+
+    All controllers in a process share one reactor thread, the I/O runtime
+    given by `runtime`. Closing a controller only closes its port, so
+    controllers can be opened and closed any number of times.
+
+    If `state_file` is given, the decoded state of the amplifier is published
+    there for other processes, see primare_control.state_snapshot.
+
+    If `history_file` is given, every state change is appended to it, see
+    primare_control.history.
+
+    Input names reported by the amplifier are cached in `inputs_file`, see
+    primare_control.input_index, so inputs can be selected by name.
+    """
 
     # Number of volume levels the amplifier supports.
     # Primare amplifiers have 79 levels
     _VOLUME_LEVELS = 79
+    # Number of inputs on the largest amplifier (I32)
+    _INPUTS = 12
 
     def __init__(self,
                  port="/dev/ttyUSB0",
                  baudrate=4800,
                  source=None,
                  volume=None,
-                 debug=False):
+                 debug=False,
+                 timeout=REPLY_TIMEOUT,
+                 state_file=None,
+                 inputs_file=None,
+                 history_file=None,
+                 runtime=RUNTIME):
         """Initialization."""
         self._serial_protocol = None
-        self._thread_id = None
+        self._runtime = runtime
+        self._closed = False
+        self._timeout = timeout
+        # Decoded state of the amplifier, keyed by PRIMARE_REPLY names
+        self._state = {}
+        self._state_version = 0
+        # Called in the reactor thread with the new version on every change
+        self._state_listeners = []
+        self._state_writer = None
+        if state_file:
+            self._state_writer = StateSnapshotWriter(state_file)
+        self._history = None
+        if history_file:
+            self._history = HistoryWriter(history_file)
+        self._inputs = InputNameIndex(inputs_file, key=port)
+        # Futures waiting for a reply, per reply variable in send order
+        self._pending = {}
+        # Clock times at which unanswered writes expired, per reply
+        # variable, so their late replies are not taken for newer requests
+        self._expired = {}
+        # Each byte takes 10 bit times: start bit, 8 data bits and stop bit
+        self._late_window = LATE_REPLY_BYTES * 10.0 / float(baudrate)
+        # Futures of reads in flight, per (variable, option)
+        self._inflight = {}
+        self._pending_lock = threading.RLock()
+        self.metrics = Counter()
 
         self._device_info_print = True  # Only print device info once
         self._manufacturer = ''
@@ -209,19 +421,32 @@ class PrimareController():
         logger.debug('About to open serial port {0} [{1} baud] ..'.format(
             port,
             baudrate))
-        SerialPort(protocol=self._serial_protocol,
-                   deviceNameOrPortNumber=port,
-                   reactor=reactor,
-                   baudrate=int(baudrate))
-        self._thread_id = Thread(name="TwistedReactor", target=reactor.run, args=((False,)))
-        self._thread_id.start()
+        self._runtime.attach()
+        try:
+            with TIMINGS.phase('serial port open'):
+                self._runtime.call(open_transport, port,
+                                   self._serial_protocol, baudrate,
+                                   self._runtime.reactor)
+        except Exception:
+            self._runtime.detach()
+            raise
 
     def close(self):
-        """Close down PrimareController transport and threads."""
+        """Close the serial port and detach from the I/O runtime.
+
+        Closing an already closed controller does nothing.
+        """
+        if self._closed:
+            return
+        self._closed = True
         logger.info("close")
-        self._serial_protocol.transport.loseConnection()
-        reactor.callFromThread(reactor.stop)
-        self._thread_id.join()
+        with TIMINGS.phase('close'):
+            self._runtime.call(self._serial_protocol.disconnect)
+            self._runtime.detach()
+            if self._state_writer:
+                self._state_writer.close()
+            if self._history:
+                self._runtime.call(self._history.close)
 
     # Private methods
     def _set_device_to_known_state(self):
@@ -240,6 +465,7 @@ class PrimareController():
 
             if variable_char in ['14', '15', '16', '17']:
                 self._parse_and_store(variable_char, decoded_data)
+            self._handle_reply(variable_char, decoded_data)
         else:
             logger.info("Received empty string")
 
@@ -248,31 +474,18 @@ class PrimareController():
 
         Replace any '\x10\x10' sequences with '\x10'.
         Returns the variable char and the data received between the STX and
-        DLE+ETX markers
+        DLE+ETX markers, both hex encoded.
         """
-        variable_char = ''
-        data = ''
-
-        # logger.debug('Read: "%s"', binascii.hexlify(rawdata))
-        byte_string = struct.unpack('c' * len(rawdata), rawdata)
-        variable_char = binascii.hexlify(''.join(byte_string[POS_REPLY_VAR]))
-        byte_string = byte_string[POS_REPLY_DATA]
-
-        # We need to replace double DLE (0x10) with single DLE
-        for byte_pairs in zip(byte_string[0:None:2],
-                              byte_string[1:None:2]):
-            # Convert binary tuple to str to ascii
-            str_pairs = binascii.hexlify(''.join(byte_pairs))
-            if str_pairs == '1010':
-                data += '10'
-            else:
-                data += str_pairs
-        # Very often we have an odd amount of data which not handled by
-        # the zip above, manually append that one byte
-        if len(byte_string) % 2 != 0:
-            data += binascii.hexlify(byte_string[-1])
-
-        logger.debug('Read(%s) = %s (%s)', PRIMARE_REPLY[variable_char], data,
+        variable_char = binascii.hexlify(rawdata[POS_REPLY_VAR]).decode(
+            'ascii')
+        # We need to replace double DLE (0x10) with single DLE. The line is
+        # unescaped and hex encoded in one pass each, without going through
+        # the individual bytes.
+        data = binascii.hexlify(rawdata[POS_REPLY_DATA].replace(
+            BYTE_DLE + BYTE_DLE, BYTE_DLE)).decode('ascii')
+
+        logger.debug('Read(%s) = %s (%s)',
+                     PRIMARE_REPLY.get(variable_char, variable_char), data,
                      binascii.hexlify(rawdata))
         return variable_char, data
 
@@ -300,48 +513,169 @@ class PrimareController():
         elif variable_char == '17':
             self._swversion = data
 
+    def _update_state(self, variable_char, data, value):
+        """Store a decoded reply and publish the state if it changed."""
+        name = PRIMARE_REPLY.get(variable_char)
+        # The name of a specific input says nothing about the current state
+        if name is None or variable_char == '94':
+            return
+        changes = {name: value}
+        if variable_char == '14':
+            number = _split_inputname(data)[0]
+            if number is not None:
+                changes['input'] = number
+        if all(self._state.get(key) == changes[key] for key in changes):
+            return
+
+        self._state.update(changes)
+        self._state_version += 1
+        if self._state_writer:
+            self._state_writer.publish(self._state)
+        for listener in self._state_listeners:
+            listener(self._state_version)
+        if self._history:
+            now = time.time()
+            for key in changes:
+                if self._history.append(key, changes[key], now):
+                    self._runtime.reactor.callLater(FLUSH_INTERVAL,
+                                                    self._history.flush)
+
+    def _handle_reply(self, variable_char, data):
+        """Update state and resolve the oldest future waiting for a reply."""
+        value = _reply_value(variable_char, data)
+        self._update_state(variable_char, data, value)
+        if variable_char in ['14', '94']:
+            number = _split_inputname(data)[0]
+            if number is not None:
+                self._inputs.update(number, value)
+        with self._pending_lock:
+            self.metrics['replies'] += 1
+            if self._late_reply(variable_char):
+                logger.debug('Late reply for %s discarded', variable_char)
+                return
+            waiting = self._pending.get(variable_char)
+            future = waiting.popleft() if waiting else None
+        if future is not None:
+            future.set_result(value)
+
+    def _late_reply(self, variable_char):
+        """Return True if a reply is the late reply to an expired write.
+
+        Replies carry no request id, so only a reply arriving within the
+        transfer time of a frame after a write expired is taken to be its
+        reply. Older expiries are forgotten, as the amplifier may not have
+        answered at all, e.g. while powered off. Expired reads are not
+        tracked, their late reply carries the current value anyway.
+        """
+        expired = self._expired.get(variable_char)
+        now = clock()
+        while expired and expired[0] < now - self._late_window:
+            expired.popleft()
+        if not expired:
+            return False
+        expired.popleft()
+        self.metrics['late_replies'] += 1
+        return True
+
+    def _expire_reply(self, variable_char, future, read=False):
+        """Fail future with PrimareTimeoutError if still unanswered."""
+        with self._pending_lock:
+            waiting = self._pending.get(variable_char, [])
+            if future not in waiting:
+                return
+            waiting.remove(future)
+            if not read:
+                self._expired.setdefault(variable_char,
+                                         deque()).append(clock())
+            self.metrics['timeouts'] += 1
+        future.set_exception(PrimareTimeoutError(
+            "No reply for '{}' within {} seconds".format(
+                PRIMARE_REPLY.get(variable_char, variable_char),
+                self._timeout)))
+
+    def _expect_reply(self, variable):
+        """Return a future for the reply to variable.
+
+        Commands which do not wait for a reply, or whose reply variable is
+        not known in advance, get a future which is already resolved with
+        None.
+        """
+        reply = PRIMARE_CMD[variable][INDEX_REPLY]
+        if not PRIMARE_CMD[variable][INDEX_WAIT] or reply[0:2] in ['', 'YY']:
+            return _resolved()
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        variable_char = reply[0:2].lower()
+        with self._pending_lock:
+            self._pending.setdefault(variable_char, deque()).append(future)
+        reactor = self._runtime.reactor
+        reactor.callFromThread(reactor.callLater, self._timeout,
+                               self._expire_reply, variable_char, future,
+                               variable in PRIMARE_READS)
+        return future
+
+    def _read_done(self, key, future):
+        """Stop sharing future once the read it belongs to is done."""
+        with self._pending_lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
     def _send_command(self, variable, option=None):
         """Send command to the amplifier with optional data.
 
         Variable: String key for the PRIMARE_CMD dict
         Option: String value needed for some of the commands, None if unused
+        Returns a future resolving with the value of the reply. Reads
+        identical to one already in flight return the future of that read
+        without sending anything, unless any other command was sent since,
+        as the read in flight may then reply with a stale value.
         """
-        command = PRIMARE_CMD[variable][INDEX_CMD]
-        data = PRIMARE_CMD[variable][INDEX_VARIABLE]
-        if option is not None:
-            data = data.replace('YY', option)
+        command, data = _command_data(variable, option)
+        future, shared = self._register_command(variable, option)
+        if shared:
+            logger.debug('_send_command(%s), sharing read in flight',
+                         variable)
+            return future
         logger.debug('_send_command(%s), data: "%s"', variable, data)
         self._write(command, data)
+        return future
 
-    def _write(self, cmd_type, data):
-        r"""Write data to the serial port.
+    def _register_command(self, variable, option=None):
+        """Prepare for a command about to be written to the amplifier.
 
-        Any occurences of '\x10' must be replaced with '\x10\x10' and add
-        the STX and DLE+ETX markers
+        Must be called before writing the frame, so a fast reply cannot be
+        missed. Returns the future for the reply and whether it is that of
+        an identical read in flight, in which case nothing must be written.
         """
-        # We need to replace single DLE (0x10) with double DLE
-        # Seems redundant as there is no '0x10' command, and we only have one
-        # variable that could be 0x10, followed by 0x10 0x03
-        data_safe = ''
-        for index in range(0, len(data) - 1, 2):
-            pair = data[index:index + 2]
-            if pair == '10':
-                data_safe += '1010'
-            else:
-                data_safe += pair
-        # Convert ascii string to binary
-        binary_variable = binascii.unhexlify(data_safe)
-
-        binary_data = BYTE_STX
-        binary_data += BYTE_WRITE if cmd_type == 'W' else BYTE_READ
-        binary_data += binary_variable + BYTE_DLE_ETX
+        key = (variable, option)
+        with self._pending_lock:
+            if variable not in PRIMARE_READS:
+                # E.g. input_set also changes the reply to
+                # inputname_current_get, so stop sharing any read
+                self._inflight.clear()
+            elif key in self._inflight:
+                self.metrics['frames_saved'] += 1
+                return self._inflight[key], True
+            future = self._expect_reply(variable)
+            if variable in PRIMARE_READS:
+                self._inflight[key] = future
+                future.add_done_callback(
+                    functools.partial(self._read_done, key))
+            self.metrics['frames_sent'] += 1
+        return future, False
 
+    def _write(self, cmd_type, data):
+        """Write data to the serial port, see _encode_frame."""
+        binary_data = _encode_frame(cmd_type, data)
         logger.debug('WriteHex: %s', binascii.hexlify(binary_data))
-        self._serial_protocol.sendLine(binary_data)
+        self._runtime.reactor.callFromThread(self._serial_protocol.sendLine,
+                                             binary_data)
         # TODO: Find a better way around this
         # Needed as we otherwise shut down too quickly, we won't have
         # time to read the buffer and parse the data.
-        time.sleep(0.05)
+        with TIMINGS.phase('write pacing sleep'):
+            time.sleep(WRITE_PACING)
 
     # Public methods
     def setup(self):
@@ -354,7 +688,7 @@ class PrimareController():
         Print information about the amplifier
         """
         self._set_device_to_known_state()
-        self.device_info()
+        return self.device_info()
 
     def device_info(self):
         """Retrieve and print information on Primare amplifier."""
@@ -363,15 +697,15 @@ class PrimareController():
         self.modelname_get()
         self.swversion_get()
         # We always get inputname last, this represents our initialization
-        self.inputname_current_get()
+        return self.inputname_current_get()
 
     def power_on(self):
         """Power on the Primare amplifier."""
-        self._send_command('power_set', '01')
+        return self._send_command('power_set', '01')
 
     def power_off(self):
         """Power off the Primare amplifier."""
-        self._send_command('power_set', '00')
+        return self._send_command('power_set', '00')
 
     def power_toggle(self):
         """Toggle the power to the Primare amplifier.
@@ -379,7 +713,7 @@ class PrimareController():
         :rtype: :class:True if amplifier turned on as result of toggle,
           :class:False otherwise
         """
-        self._send_command('power_toggle')
+        return self._send_command('power_toggle')
 
     def input_set(self, source):
         """Set the current input used by the Primare amplifier.
@@ -398,25 +732,38 @@ class PrimareController():
         10 = DIG4
         11 = PC
         12 = BT
+
+        The input can also be given by the name shown on the amplifier, e.g.
+        "Turntable". Names are resolved from the cached input names, which
+        are fetched from the amplifier by inputnames_get if unknown.
         """
-        self._send_command('input_set', '{:02X}'.format(int(source) % 13))
+        try:
+            number = self._inputs.resolve(source)
+        except KeyError:
+            self.inputnames_get().result()
+            number = self._inputs.resolve(source)
+        future = self._send_command('input_set',
+                                    '{:02X}'.format(number % 13))
         self.inputname_current_get()
+        return future
 
     def input_next(self):
         """Select next input on device.
         
         After changing the input, we request the input name.
         """
-        self._send_command('input_next')
+        future = self._send_command('input_next')
         self.inputname_current_get()
+        return future
 
     def input_prev(self):
         """Select previous input on device.
         
         After changing the input, we request the input name.
         """
-        self._send_command('input_prev')
+        future = self._send_command('input_prev')
         self.inputname_current_get()
+        return future
 
     def volume_get(self):
         """Get volume level of the amplifier on a linear scale from 0 to 79.
@@ -425,14 +772,14 @@ class PrimareController():
         0: Silent
         79: Maximum volume.
         """
-        self._send_command('volume_get')
+        return self._send_command('volume_get')
 
     def volume_set(self, volume):
         """Set volume level of the amplifier.
 
         Range is 0-79.
         """
-        self._send_command('volume_set', '{:02X}'.format(
+        return self._send_command('volume_set', '{:02X}'.format(
             volume if volume < 80 else 0x4F))
         # There's a crazy bug where setting the volume to 65 and above will
         # generate a reply indicating a volume of 1 less!?
@@ -448,19 +795,19 @@ class PrimareController():
 
     def volume_up(self):
         """Increase volume by one step."""
-        self._send_command('volume_up')
+        return self._send_command('volume_up')
 
     def volume_down(self):
         """Decrease volume by one step."""
-        self._send_command('volume_down')
+        return self._send_command('volume_down')
 
     def balance_adjust_left(self):
         """Adjust balance to left."""
-        self._send_command('balance_adjust', '{:02X}'.format(0x01))
+        return self._send_command('balance_adjust', '{:02X}'.format(0x01))
 
     def balance_adjust_right(self):
         """Adjust balance to right."""
-        self._send_command('balance_adjust', '{:02X}'.format(0xFF))
+        return self._send_command('balance_adjust', '{:02X}'.format(0xFF))
 
     def balance_set(self, balance):
         """Set specific balance setting.
@@ -473,15 +820,15 @@ class PrimareController():
         if balance > 10:
             balance = 0xFF - (balance - 11)
         logger.info("balance set arg: {}".format(balance))
-        self._send_command('balance_set', "{:02X}".format(balance))
+        return self._send_command('balance_set', "{:02X}".format(balance))
 
     def mute_toggle(self):
         """Toggle mute on device."""
-        self._send_command('mute_toggle')
+        return self._send_command('mute_toggle')
 
     def mute_get(self):
         """Get mute state of the mixer."""
-        self._send_command('mute_get')
+        return self._send_command('mute_get')
 
     def mute_set(self, mute):
         """Enable or disable mute on device.
@@ -490,16 +837,20 @@ class PrimareController():
         False = Unmute
         """
         mute_value = '01' if mute is True else '00'
-        self._send_command('mute_set', mute_value)
+        return self._send_command('mute_set', mute_value)
 
     def dim_cycle(self):
         """Cycle through the different dim levels on device."""
-        self._send_command('dim_cycle')
+        return self._send_command('dim_cycle')
 
     def dim_set(self, level):
-        """Select a specific dim level on device."""
-        if level >= 0:
-            self._send_command('dim_set', '{:02X}'.format(int(level) % 4))
+        """Select a specific dim level on device.
+
+        Negative levels are ignored, the future resolves with None.
+        """
+        if level < 0:
+            return _resolved()
+        return self._send_command('dim_set', '{:02X}'.format(int(level) % 4))
 
     def verbose_toggle(self):
         """Toggle verbose mode on device.
@@ -507,7 +858,7 @@ class PrimareController():
         When verbose is active, device will respond to commands and inform
         about changes to variables.
         """
-        self._send_command('verbose_toggle')
+        return self._send_command('verbose_toggle')
 
     def verbose_set(self, verbose):
         """Enable or disables verbose mode on device.
@@ -516,11 +867,11 @@ class PrimareController():
         False = Disable verbose mode.
         """
         verbose_value = '01' if verbose is True else '00'
-        self._send_command('verbose_set', verbose_value)
+        return self._send_command('verbose_set', verbose_value)
 
     def menu_toggle(self):
         """Enter or leaves menu of device."""
-        self._send_command('menu_toggle')
+        return self._send_command('menu_toggle')
 
     def menu_set(self, menu):
         """Control menus on the amplifier.
@@ -528,7 +879,7 @@ class PrimareController():
         Allow closing of the menu or stepping into or out of a submenu if the
         menu is active.
         """
-        self._send_command('menu_set', '{:02X}'.format(int(menu)))
+        return self._send_command('menu_set', '{:02X}'.format(int(menu)))
 
     def remote_cmd(self, cmd):
         """Send an IR command to the device.
@@ -536,11 +887,11 @@ class PrimareController():
         The command will be treated as if the IR remote control has been used
         to send the command.
         """
-        self._send_command('remote_cmd', cmd)
+        return self._send_command('remote_cmd', cmd)
 
     def ir_input_toggle(self):
         """Toggle IR input source on device between front and back."""
-        self._send_command('ir_input_toggle')
+        return self._send_command('ir_input_toggle')
 
     def ir_input_set(self, ir_input):
         """Select either front or back as current IR input source on device.
@@ -549,33 +900,48 @@ class PrimareController():
         True = Back
         """
         ir_value = '01' if ir_input is True else '00'
-        self._send_command('ir_input_set', ir_value)
+        return self._send_command('ir_input_set', ir_value)
 
     def recall_factory_settings(self):
         """Perform a factory reset.
 
         Restore default values and restart the device.
         """
-        self._send_command('recall_factory_settings')
+        return self._send_command('recall_factory_settings')
 
     def manufacturer_get(self):
         """Read manufacturer name from the device."""
-        self._send_command('manufacturer_get')
+        return self._send_command('manufacturer_get')
 
     def modelname_get(self):
         """Read model name from device."""
-        self._send_command('modelname_get')
+        return self._send_command('modelname_get')
 
     def swversion_get(self):
         """Read current software version from device."""
-        self._send_command('swversion_get')
+        return self._send_command('swversion_get')
 
     def inputname_current_get(self):
         """Read current input name from device."""
-        self._send_command('inputname_current_get')
+        return self._send_command('inputname_current_get')
 
     def inputname_specific_get(self, input):
-        """Read specified input name from device."""
-        if input >= 0:
-            self._send_command('inputname_specific_get',
-                               '{:02X}'.format((int(input) % 8)))
+        """Read specified input name from device.
+
+        Negative inputs are ignored, the future resolves with None.
+        """
+        if input < 0:
+            return _resolved()
+        return self._send_command('inputname_specific_get',
+                                  '{:02X}'.format((int(input) % 13)))
+
+    def inputnames_get(self):
+        """Read the names of all inputs from device.
+
+        All requests are sent before waiting for the replies. The reply is a
+        dict of input number to input name, which is also cached for
+        selecting inputs by name.
+        """
+        futures = [self.inputname_specific_get(number)
+                   for number in range(1, self._INPUTS + 1)]
+        return _after_all(futures, self._inputs.names)
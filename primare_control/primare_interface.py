@@ -5,11 +5,24 @@ command line using Primare's binary protocol via the RS232 port on the
 amplifier.
 """
 
+import cProfile
 import logging
+import time
 import click
 
 from contextlib import closing
-from primare_control import PrimareController
+from primare_control import PrimareController, PrimareTimeoutError
+
+try:
+    from . import autodetect, http_api
+    from .runtime import RUNTIME
+    from .timings import TIMINGS
+except (ImportError, ValueError):
+    # Run as a script from within the package directory
+    import autodetect
+    import http_api
+    from runtime import RUNTIME
+    from timings import TIMINGS
 
 # from twisted.logger import (
 #     FilteringLogObserver,
@@ -35,6 +48,43 @@ logging.basicConfig(level=logging.DEBUG, format=FORMAT)
 
 logger = logging.getLogger(__name__)
 
+# Commands of the CLI which are not PrimareController methods
+CLI_COMMANDS = ['detect', 'interactive', 'serve']
+
+
+def _parse_value(value):
+    """Return value as int if it is a number, names are passed as is."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _open_controller(params):
+    """Return a PrimareController configured from the CLI parameters.
+
+    The port 'auto' uses the port and baudrate found by detect.
+    """
+    port, baudrate = params['port'], params['baudrate']
+    if port == 'auto':
+        with TIMINGS.phase('detect'):
+            detections = autodetect.detect_cached()
+        if not detections:
+            raise click.ClickException("No amplifier found")
+        port, baudrate = detections[0].port, detections[0].baudrate
+    with TIMINGS.phase('controller open'):
+        try:
+            return PrimareController(port=port,
+                                     baudrate=baudrate,
+                                     source=None,
+                                     volume=None,
+                                     debug=params['debug'],
+                                     state_file=params['state_file'],
+                                     history_file=params['history_file'])
+        except ValueError as e:
+            # Unsupported port or a --state-file which is not a snapshot
+            raise click.ClickException(str(e))
+
 
 class DefaultCmdGroup(click.Group):
     """Custom implementation for handling Primare methods in a unified way."""
@@ -43,7 +93,7 @@ class DefaultCmdGroup(click.Group):
         """List Primare Control methods."""
         rv = [method for method in dir(PrimareController)
               if not method.startswith('_')]
-        rv.append('interactive')
+        rv.extend(CLI_COMMANDS)
         rv.sort()
         return rv
 
@@ -55,29 +105,35 @@ class DefaultCmdGroup(click.Group):
             #logger.debug("subcommand args: {}".format(args))
             #logger.debug("subcommand kwargs: {}".format(kwargs))
             ctx = args[0]
-            params = ctx.obj['parameters']
-            ctx.obj['p_ctrl'] = PrimareController(port=params['port'],
-                                                  baudrate=params['baudrate'],
-                                                  source=None,
-                                                  volume=None,
-                                                  debug=params['debug'])
+            ctx.obj['p_ctrl'] = _open_controller(ctx.obj['parameters'])
             with closing(ctx.obj['p_ctrl']):
                 try:
                     if ctx.obj['parameters']['amp_info']:
-                        ctx.obj['p_ctrl'].setup()
+                        with TIMINGS.phase('setup'):
+                            ctx.obj['p_ctrl'].setup()
 
                     method = getattr(PrimareController, name)
-                    if len(kwargs):
-                        method(ctx.obj['p_ctrl'], int(kwargs['value']))
-                    else:
-                        method(ctx.obj['p_ctrl'])
+                    with TIMINGS.phase('command'):
+                        if len(kwargs):
+                            reply = method(ctx.obj['p_ctrl'],
+                                           _parse_value(kwargs['value']))
+                        else:
+                            reply = method(ctx.obj['p_ctrl'])
+                    with TIMINGS.phase('reply wait'):
+                        value = reply.result() if reply is not None else None
+                    if value is not None:
+                        logger.info("{}: {}".format(name, value))
+                except PrimareTimeoutError as e:
+                    logger.error(e)
                 except KeyboardInterrupt:
                     logger.info("User aborted")
+                except KeyError as e:
+                    logger.error("Unknown input name: {}".format(e))
                 except TypeError as e:
                     logger.error(e)
 
-        if name == "interactive":
-            cmd = click.Group.get_command(self, ctx, 'interactive')
+        if name in CLI_COMMANDS:
+            cmd = click.Group.get_command(self, ctx, name)
         else:
             if name in [method for method in dir(PrimareController)
                         if not method.startswith('_')]:
@@ -121,14 +177,46 @@ class DefaultCmdGroup(click.Group):
               default=False,
               is_flag=True,
               help="Enable debug output.")
+@click.option("--history-file",
+              default=None,
+              help="Append amplifier state changes to this file "
+              "(see primare_control.history).")
 @click.option("--port",
               "-p",
               default="/dev/ttyUSB0",
               help="Serial port to use (e.g. 3 for a COM port on Windows, "
               "/dev/ttyATH0 for Arduino Yun, /dev/ttyACM0 for Serial-over-USB "
-              "on RaspberryPi.")
-def cli(ctx, amp_info, baudrate, debug, port):
+              "on RaspberryPi. Use tcp://host:port for an RS232 to Ethernet "
+              "bridge in raw TCP mode or pty:///dev/pts/N for a pseudo "
+              "terminal. Use auto for the amplifier found by detect.")
+@click.option("--profile",
+              default=None,
+              metavar="FILE",
+              help="Write cProfile statistics of the run to FILE.")
+@click.option("--state-file",
+              default=None,
+              help="Publish amplifier state to this file for other processes"
+              " (see primare_control.state_snapshot).")
+@click.option("--timings",
+              default=False,
+              is_flag=True,
+              help="Print how long each phase of the run took at exit.")
+def cli(ctx, amp_info, baudrate, debug, history_file, port, profile,
+        state_file, timings):
     """Prototype command."""
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def dump_profile():
+            profiler.disable()
+            profiler.dump_stats(profile)
+            logger.info("Profile written to {}".format(profile))
+        ctx.call_on_close(dump_profile)
+    if timings:
+        ctx.call_on_close(
+            lambda: logger.info("Timings:\n{}".format(TIMINGS.report())))
+
     try:
         # on Windows, we need port to be an integer
         port = int(port)
@@ -141,7 +229,9 @@ def cli(ctx, amp_info, baudrate, debug, port):
         'amp_info': amp_info,
         'baudrate': baudrate,
         'debug': debug,
+        'history_file': history_file,
         'port': port,
+        'state_file': state_file,
     }
 
 
@@ -163,12 +253,7 @@ Available commands are:
 {}""".format('\n'.join("  {} {}".format(method.ljust(25), doc.splitlines()[0])
                        for method, doc in method_list))
     try:
-        params = ctx.obj['parameters']
-        ctx.obj['p_ctrl'] = PrimareController(port=params['port'],
-                                              baudrate=params['baudrate'],
-                                              source=None,
-                                              volume=None,
-                                              debug=params['debug'])
+        ctx.obj['p_ctrl'] = _open_controller(ctx.obj['parameters'])
         if ctx.obj['parameters']['amp_info']:
             ctx.obj['p_ctrl'].setup()
 
@@ -209,10 +294,12 @@ Available commands are:
                                 pass
                                 parsed_cmd[1] = '{}'.format(parsed_cmd[1])
                             else:
-                                parsed_cmd[1] = int(parsed_cmd[1])
+                                parsed_cmd[1] = _parse_value(parsed_cmd[1])
                             command(parsed_cmd[1])
                         else:
                             command()
+                    except KeyError as e:
+                        logger.warn("Unknown input name: {}".format(e))
                     except TypeError as e:
                         logger.warn("You called a method with an incorrect" +
                                     "number of parameters: {}".format(e))
@@ -225,5 +312,75 @@ Available commands are:
     del ctx.obj['p_ctrl']
     ctx.obj['p_ctrl'] = None
 
+
+@cli.command()
+@click.option("--rescan",
+              default=False,
+              is_flag=True,
+              help="Ignore the cached result and scan all serial ports.")
+@click.pass_context
+def detect(ctx, rescan):
+    """Find the serial port, baudrate and model of the amplifier.
+
+    All serial ports are probed concurrently, trying the most likely
+    baudrates first. The result is cached and used by --port auto.
+    """
+    if rescan:
+        detections = autodetect.detect()
+        if detections:
+            autodetect.save_cached(detections[0])
+    else:
+        detections = autodetect.detect_cached()
+    if not detections:
+        logger.error("No amplifier found on {}".format(
+            ', '.join(autodetect.candidate_ports()) or 'any serial port'))
+    for detection in detections:
+        logger.info("{} on {} at {} baud".format(detection.model,
+                                                 detection.port,
+                                                 detection.baudrate))
+
+
+@cli.command()
+@click.option("--http-host",
+              default='127.0.0.1',
+              help="Address to serve HTTP on, only this host by default. "
+                   "Commands are not authenticated, use '' for all "
+                   "addresses on trusted networks only.")
+@click.option("--http-port",
+              default=8080,
+              help="Port to serve HTTP on.")
+@click.pass_context
+def serve(ctx, http_host, http_port):
+    """Serve amplifier state and commands over HTTP.
+
+    GET /state returns the state as JSON with an ETag,
+    GET /state/poll?version=V waits for the next change and
+    POST /command/<name> runs a command, e.g. /command/volume_set?value=30.
+
+    Press Ctrl-C to stop.
+    """
+    ctx.obj['p_ctrl'] = _open_controller(ctx.obj['parameters'])
+    with closing(ctx.obj['p_ctrl']):
+        try:
+            if ctx.obj['parameters']['amp_info']:
+                ctx.obj['p_ctrl'].setup()
+            else:
+                # Verbose mode makes the amplifier report changes on its own
+                ctx.obj['p_ctrl'].verbose_set(True)
+            ctx.obj['p_ctrl'].volume_get()
+            ctx.obj['p_ctrl'].inputname_current_get()
+            listening_port = RUNTIME.call(http_api.listen, ctx.obj['p_ctrl'],
+                                          http_port, http_host)
+            logger.info("Serving HTTP on {}:{}".format(http_host or '*',
+                                                       http_port))
+            try:
+                while True:
+                    time.sleep(1)
+            finally:
+                RUNTIME.call(listening_port.stopListening)
+        except KeyboardInterrupt:
+            logger.info("User aborted")
+
+
 if __name__ == '__main__':
     cli()
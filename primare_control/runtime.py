@@ -0,0 +1,95 @@
+"""Process wide I/O runtime shared by all Primare controllers.
+
+Twisted's reactor cannot be restarted once stopped, so controllers must not
+start and stop it themselves. Instead they attach to the process wide
+RUNTIME, which starts the reactor in a background thread the first time it
+is needed and keeps it running until the process exits. Opening or closing
+a controller then only opens or closes its port.
+"""
+
+from __future__ import with_statement
+
+import atexit
+import functools
+import logging
+import threading
+
+from twisted.internet import reactor
+from twisted.internet.threads import blockingCallFromThread
+from twisted.python import threadable
+
+try:
+    from .timings import TIMINGS
+except (ImportError, ValueError):
+    # Imported as a top level module when primare_interface.py is run as a
+    # script from within the package directory
+    from timings import TIMINGS
+
+logger = logging.getLogger(__name__)
+
+
+class IORuntime(object):
+    """Run a Twisted reactor in a background thread on demand."""
+
+    def __init__(self, reactor=reactor):
+        """Initialization."""
+        self.reactor = reactor
+        self._lock = threading.Lock()
+        self._thread = None
+        self._attached = 0
+
+    def _start(self):
+        # A host application may already be running the reactor
+        if self.reactor.running:
+            return
+        with TIMINGS.phase('reactor thread start'):
+            self._thread = threading.Thread(name="TwistedReactor",
+                                            target=self.reactor.run,
+                                            args=(False,))
+            self._thread.daemon = True
+            self._thread.start()
+        atexit.register(self.shutdown)
+
+    def attach(self):
+        """Register a user of the runtime, starting the reactor if needed."""
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            self._attached += 1
+
+    def detach(self):
+        """Unregister a user of the runtime.
+
+        The reactor keeps running, as it could not be started again.
+        """
+        with self._lock:
+            self._attached -= 1
+
+    @property
+    def attached(self):
+        """Number of controllers currently attached."""
+        return self._attached
+
+    def call(self, function, *args, **kwargs):
+        """Call function in the reactor thread and return its result.
+
+        If function returns a Deferred, wait for it to fire.
+        """
+        if threadable.isInIOThread():
+            return function(*args, **kwargs)
+        # Keyword arguments are bound up front as they may clash with the
+        # arguments of blockingCallFromThread, e.g. reactor
+        return blockingCallFromThread(
+            self.reactor, functools.partial(function, *args, **kwargs))
+
+    def shutdown(self):
+        """Stop the reactor thread, called when the process exits."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            logger.debug("Stopping reactor thread")
+            self.reactor.callFromThread(self.reactor.stop)
+            thread.join()
+
+
+RUNTIME = IORuntime()
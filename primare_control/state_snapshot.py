@@ -0,0 +1,161 @@
+"""Share decoded amplifier state between processes.
+
+The process owning the serial port publishes the state it decodes from the
+amplifier into a small memory mapped file. Other local processes can read a
+consistent snapshot of it without opening the serial port, without any IPC
+round trip and without importing Twisted.
+
+Consistency is guaranteed by a sequence lock: the writer makes the sequence
+counter odd before updating the payload and even again afterwards. A reader
+retries until it has read the payload between two identical, even counter
+values.
+"""
+
+from __future__ import with_statement
+
+import collections
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+# File layout, all little endian:
+#  magic (4s), layout version (H), reserved (H), sequence counter (I)
+#  updated (d), power (b), input (h), volume (h), mute (b), inputname (32s)
+# Integers are -1 while the value is unknown.
+HEADER = struct.Struct('<4sHHI')
+PAYLOAD = struct.Struct('<dbhhb32s')
+MAGIC = b'PRMS'
+LAYOUT_VERSION = 1
+SEQ_OFFSET = 8
+SNAPSHOT_SIZE = HEADER.size + PAYLOAD.size
+
+# Number of attempts before a reader gives up on a writer that never
+# finishes updating the payload
+MAX_READ_RETRIES = 10000
+
+StateSnapshot = collections.namedtuple(
+    'StateSnapshot',
+    ['version', 'updated', 'power', 'input', 'volume', 'mute', 'inputname'])
+
+
+def default_path():
+    """Return the default location of the state snapshot file."""
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, 'primare_control.state')
+
+
+def _int_or_unknown(value):
+    return -1 if value is None else int(value)
+
+
+def _unknown_or_int(value):
+    return None if value < 0 else value
+
+
+def _unknown_or_bool(value):
+    return None if value < 0 else bool(value)
+
+
+class StateSnapshotWriter(object):
+    """Publish amplifier state into a memory mapped snapshot file."""
+
+    def __init__(self, path=None):
+        """Create or reuse the snapshot file at path.
+
+        Raises ValueError if path is a non-empty file which is not a state
+        snapshot, rather than overwriting it.
+        """
+        self._path = path or default_path()
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.read(fd, len(MAGIC)) != MAGIC:
+                raise ValueError(
+                    'Not a Primare state snapshot: {}'.format(self._path))
+            if size != SNAPSHOT_SIZE:
+                os.ftruncate(fd, SNAPSHOT_SIZE)
+            self._mmap = mmap.mmap(fd, SNAPSHOT_SIZE)
+        finally:
+            os.close(fd)
+        # Existing readers keep their mapping, so continue the counter of a
+        # previous writer rather than starting over
+        magic, _, _, seq = HEADER.unpack_from(self._mmap, 0)
+        if magic == MAGIC:
+            self._seq = seq + (seq % 2)
+        else:
+            self._seq = 0
+            PAYLOAD.pack_into(self._mmap, HEADER.size, 0.0, -1, -1, -1, -1,
+                              b'')
+        HEADER.pack_into(self._mmap, 0, MAGIC, LAYOUT_VERSION, 0, self._seq)
+
+    def publish(self, state):
+        """Publish state, a dict as kept by PrimareController."""
+        inputname = state.get('inputname') or ''
+        payload = PAYLOAD.pack(time.time(),
+                               _int_or_unknown(state.get('power')),
+                               _int_or_unknown(state.get('input')),
+                               _int_or_unknown(state.get('volume')),
+                               _int_or_unknown(state.get('mute')),
+                               inputname.encode('utf-8')[:32])
+        struct.pack_into('<I', self._mmap, SEQ_OFFSET, self._seq + 1)
+        self._mmap[HEADER.size:SNAPSHOT_SIZE] = payload
+        self._seq += 2
+        struct.pack_into('<I', self._mmap, SEQ_OFFSET, self._seq)
+
+    def close(self):
+        """Unmap the snapshot file, leaving the last state for readers."""
+        self._mmap.close()
+
+
+class StateSnapshotReader(object):
+    """Read consistent snapshots of the amplifier state."""
+
+    def __init__(self, path=None):
+        """Map the snapshot file at path.
+
+        Raises IOError/OSError if no writer has created the file yet.
+        """
+        with open(path or default_path(), 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), SNAPSHOT_SIZE,
+                                   access=mmap.ACCESS_READ)
+        magic, layout, _, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            self._mmap.close()
+            raise ValueError('Not a Primare state snapshot: {}'.format(path))
+
+    def read(self):
+        """Return the current state as a StateSnapshot."""
+        for _ in range(MAX_READ_RETRIES):
+            seq = struct.unpack_from('<I', self._mmap, SEQ_OFFSET)[0]
+            if seq % 2 == 0:
+                payload = PAYLOAD.unpack_from(self._mmap, HEADER.size)
+                if seq == struct.unpack_from('<I', self._mmap,
+                                             SEQ_OFFSET)[0]:
+                    break
+        else:
+            raise RuntimeError('State snapshot writer did not finish')
+
+        updated, power, input, volume, mute, inputname = payload
+        return StateSnapshot(version=seq // 2,
+                             updated=updated,
+                             power=_unknown_or_bool(power),
+                             input=_unknown_or_int(input),
+                             volume=_unknown_or_int(volume),
+                             mute=_unknown_or_bool(mute),
+                             inputname=inputname.rstrip(b'\0').decode(
+                                 'utf-8', 'replace'))
+
+    def close(self):
+        """Unmap the snapshot file."""
+        self._mmap.close()
+
+
+def read_snapshot(path=None):
+    """Return a single StateSnapshot of the file at path."""
+    reader = StateSnapshotReader(path)
+    try:
+        return reader.read()
+    finally:
+        reader.close()
@@ -0,0 +1,66 @@
+"""Timing of the phases of a Primare Control run.
+
+Phases such as importing Twisted, opening the serial port or the pacing
+sleeps between frames are timed with a monotonic clock into the process
+wide TIMINGS recorder. Recording is cheap enough to always be active, the
+CLI prints the breakdown when run with --timings.
+"""
+
+from __future__ import with_statement
+
+import collections
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Python 2 has no monotonic clock in the standard library
+clock = getattr(time, 'monotonic', time.time)
+
+START = clock()
+
+
+class Timings(object):
+    """Accumulate count and total duration per named phase.
+
+    Phases may be recorded from several threads at once.
+    """
+
+    def __init__(self):
+        """Initialization."""
+        self._phases = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """Add one occurrence of phase name lasting seconds."""
+        with self._lock:
+            count, total = self._phases.get(name, (0, 0.0))
+            self._phases[name] = (count + 1, total + seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of the with statement as phase name."""
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add(name, clock() - start)
+
+    def phases(self):
+        """Return a list of (name, count, total seconds) per phase."""
+        with self._lock:
+            return [(name, count, total) for name, (count, total) in
+                    self._phases.items()]
+
+    def report(self):
+        """Return the phases and the time since START as a table."""
+        lines = ['{:<28} {:>6} {:>10}'.format('Phase', 'Count', 'Total ms')]
+        for name, count, total in self.phases():
+            lines.append('{:<28} {:>6} {:>10.1f}'.format(name, count,
+                                                         total * 1000))
+        lines.append('{:<28} {:>6} {:>10.1f}'.format(
+            'total since start', '', (clock() - START) * 1000))
+        return '\n'.join(lines)
+
+
+TIMINGS = Timings()
@@ -0,0 +1,91 @@
+"""Transports connecting a PrimareProtocol to an amplifier.
+
+The port is given as a URL style string:
+ - /dev/ttyUSB0, 3 or serial:///dev/ttyUSB0 for a local serial port
+ - pty:///dev/pts/5 for a pseudo terminal, e.g. a simulated amplifier
+ - tcp://host:4001 for an RS232 to Ethernet bridge in raw TCP mode
+
+All transports deliver the received bytes straight to the protocol, so the
+framing, pacing and metrics of PrimareController are the same for all.
+"""
+
+from __future__ import with_statement
+
+import os
+
+from twisted.internet.endpoints import TCP4ClientEndpoint, connectProtocol
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+# Seconds to wait for a TCP connection to be established
+CONNECT_TIMEOUT = 5
+
+
+def parse_port(port):
+    """Return the transport scheme and address of port.
+
+    Ports without a scheme are local serial ports. Integers are kept as the
+    port number of a COM port on Windows.
+    """
+    if isinstance(port, int) or '://' not in port:
+        return 'serial', port
+    url = urlsplit(port)
+    if url.scheme == 'tcp':
+        if not url.hostname or not url.port:
+            raise ValueError("TCP port must be tcp://host:port: " + port)
+        return url.scheme, (url.hostname, url.port)
+    elif url.scheme in ['serial', 'pty']:
+        return url.scheme, url.path
+    raise ValueError("Unsupported port: " + port)
+
+
+def _open_serial(address, protocol, baudrate, reactor):
+    # Imported here as pyserial is only needed for serial ports
+    from twisted.internet.serialport import SerialPort
+    return SerialPort(protocol=protocol,
+                      deviceNameOrPortNumber=address,
+                      reactor=reactor,
+                      baudrate=int(baudrate))
+
+
+def _open_pty(address, protocol, baudrate, reactor):
+    import tty
+    from twisted.internet.stdio import StandardIO
+    fd = os.open(address, os.O_RDWR | os.O_NOCTTY)
+    # Raw mode, or the line discipline would echo and act on ETX (Ctrl-C)
+    tty.setraw(fd)
+    # Separate descriptors so reading and writing can be closed separately
+    return StandardIO(protocol, stdin=fd, stdout=os.dup(fd), reactor=reactor)
+
+
+def _open_tcp(address, protocol, baudrate, reactor):
+    host, port = address
+    endpoint = TCP4ClientEndpoint(reactor, host, port,
+                                  timeout=CONNECT_TIMEOUT)
+
+    def connected(protocol):
+        # Frames are tiny, send them without waiting to fill a segment
+        protocol.transport.setTcpNoDelay(True)
+        return protocol.transport
+    return connectProtocol(endpoint, protocol).addCallback(connected)
+
+
+TRANSPORTS = {
+    'serial': _open_serial,
+    'pty': _open_pty,
+    'tcp': _open_tcp,
+}
+
+
+def open_transport(port, protocol, baudrate, reactor):
+    """Connect protocol to the amplifier at port.
+
+    Must be called from the reactor thread. Returns the transport, or a
+    Deferred firing with it once connected. The baudrate only applies to
+    serial ports.
+    """
+    scheme, address = parse_port(port)
+    return TRANSPORTS[scheme](address, protocol, baudrate, reactor)
@@ -24,6 +24,7 @@ setup(
     include_package_data=True,
     install_requires=[
         'Click',
+        'futures; python_version < "3.0"',
         'pyserial',
         'setuptools',
         'twisted',
@@ -0,0 +1,106 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from primare_control import autodetect
+from primare_control.autodetect import Detection
+from primare_control.input_index import default_path as inputs_path
+from primare_control.timings import clock
+
+MODELNAME_GET = b'\x02\x52\x16\x00\x10\x03'
+MODELNAME_REPLY = b'\x02\x16I22\x10\x03'
+# Looks like an input name reply, as received at a wrong baudrate
+GARBAGE_REPLY = b'\x02\x14\x05\xff\xfe\x10\x03'
+
+
+class ProbeTimeoutTest(unittest.TestCase):
+
+    def test_timeout_follows_byte_time(self):
+        self.assertAlmostEqual(autodetect.probe_timeout(4800),
+                               32 * 10.0 / 4800 + autodetect.PROBE_MARGIN)
+        self.assertLess(autodetect.probe_timeout(115200),
+                        autodetect.probe_timeout(4800))
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), 'needs a pseudo terminal')
+class DetectTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = os.path.join(directory, 'detect.json')
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_pty(self):
+        master, slave = os.openpty()
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        return master, 'pty://' + os.ttyname(slave)
+
+    def amplifier(self, master, reply=MODELNAME_REPLY):
+        """Answer a modelname_get probe on master with reply."""
+        def answer():
+            frame = b''
+            try:
+                while MODELNAME_GET not in frame:
+                    frame += os.read(master, 64)
+            except OSError:
+                return
+            os.write(master, reply)
+        thread = threading.Thread(target=answer)
+        thread.daemon = True
+        thread.start()
+
+    def test_detect_finds_amplifier_among_silent_ports(self):
+        master, port = self.open_pty()
+        _, silent_port = self.open_pty()
+        self.amplifier(master)
+        self.assertEqual(autodetect.detect([silent_port, port], [4800]),
+                         [Detection(port, 4800, 'I22')])
+
+    def test_detect_does_not_wait_for_silent_ports(self):
+        master, port = self.open_pty()
+        _, silent_port = self.open_pty()
+        self.amplifier(master)
+        start = clock()
+        self.assertEqual(autodetect.detect([silent_port, port]),
+                         [Detection(port, 4800, 'I22')])
+        self.assertLess(clock() - start, 1.0)
+
+    def test_probe_does_not_touch_input_name_cache(self):
+        master, port = self.open_pty()
+        self.amplifier(master, GARBAGE_REPLY + MODELNAME_REPLY)
+        self.assertEqual(autodetect.probe(port, 4800), 'I22')
+        self.assertFalse(os.path.exists(inputs_path()))
+
+    def test_cached_detection_is_probed_first(self):
+        master, port = self.open_pty()
+        autodetect.save_cached(Detection(port, 4800, 'I22'), self.cache)
+        self.amplifier(master)
+        with mock.patch.object(autodetect, 'detect') as detect:
+            self.assertEqual(autodetect.detect_cached(self.cache),
+                             [Detection(port, 4800, 'I22')])
+        self.assertFalse(detect.called)
+
+    def test_stale_cache_triggers_scan(self):
+        _, silent_port = self.open_pty()
+        master, port = self.open_pty()
+        autodetect.save_cached(Detection(silent_port, 4800, 'I22'),
+                               self.cache)
+        self.amplifier(master)
+        self.assertEqual(
+            autodetect.detect_cached(self.cache, ports=[port],
+                                     baudrates=[4800]),
+            [Detection(port, 4800, 'I22')])
+        self.assertEqual(autodetect.load_cached(self.cache).port, port)
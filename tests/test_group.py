@@ -0,0 +1,78 @@
+from __future__ import absolute_import, unicode_literals
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from primare_control.group import PrimareGroup
+from primare_control.primare_control import PrimareTimeoutError
+
+from tests.test_primare_controller import make_controller
+
+
+class PrimareGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reactor = mock.Mock()
+        # Run calls for the reactor thread right away
+        self.reactor.callFromThread.side_effect = \
+            lambda function, *args: function(*args)
+        self.reactor.callLater.return_value = None
+        runtime = mock.Mock(reactor=self.reactor)
+        self.controllers = [make_controller(self, runtime=runtime)
+                            for _ in range(3)]
+        for controller in self.controllers:
+            controller._serial_protocol = mock.Mock()
+        self.group = PrimareGroup(self.controllers)
+
+    def test_same_frame_is_written_to_all_links(self):
+        self.group.volume_set(25)
+        frames = [controller._serial_protocol.sendLine.call_args[0][0]
+                  for controller in self.controllers]
+        self.assertEqual(frames, [b'\x02\x57\x83\x19\x10\x03'] * 3)
+        writes = [call for call in self.reactor.callFromThread.call_args_list
+                  if call[0][0] == self.group._write_all]
+        self.assertEqual(len(writes), 1)
+
+    def test_replies_and_skew(self):
+        future = self.group.mute_set(True)
+        self.assertFalse(future.done())
+        for controller in self.controllers:
+            controller._handle_reply('09', '01')
+        reply = future.result(0)
+        self.assertEqual(reply.replies, [True, True, True])
+        self.assertEqual(reply.skew,
+                         max(reply.acked_at) - min(reply.acked_at))
+        self.assertGreaterEqual(reply.skew, 0)
+
+    def test_failed_amplifier_is_not_acknowledged(self):
+        future = self.group.volume_up()
+        self.controllers[0]._handle_reply('03', '1a')
+        self.controllers[1]._handle_reply('03', '1a')
+        pending = self.controllers[2]._pending['03'][0]
+        self.controllers[2]._expire_reply('03', pending)
+        reply = future.result(0)
+        self.assertIsInstance(reply.replies[2], PrimareTimeoutError)
+        self.assertIsNone(reply.acked_at[2])
+        self.assertIsNotNone(reply.skew)
+
+    def test_command_without_reply_is_acknowledged_when_written(self):
+        reply = self.group.power_off().result(0)
+        self.assertEqual(reply.replies, [None, None, None])
+        self.assertNotIn(None, reply.acked_at)
+
+    def test_failed_write_completes_group_reply(self):
+        self.controllers[1]._serial_protocol.sendLine.side_effect = \
+            IOError('Link down')
+        reply = self.group.power_off().result(0)
+        self.assertIsNotNone(reply.acked_at[0])
+        self.assertEqual(reply.acked_at[1:], [None, None])
+
+    def test_group_write_ends_sharing_of_reads(self):
+        controller = self.controllers[0]
+        before = controller.volume_get()
+        self.group.volume_set(30)
+        self.assertIsNot(controller.volume_get(), before)
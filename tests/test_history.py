@@ -0,0 +1,84 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from primare_control import history
+from primare_control.history import HistoryWriter, query
+
+
+class HistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'history')
+
+    def test_records_are_written_in_batches(self):
+        writer = HistoryWriter(self.path, batch_records=4, fsync=False)
+        self.assertTrue(writer.append('volume', 30, 100.0))
+        self.assertFalse(writer.append('volume', 31, 101.0))
+        self.assertEqual(os.path.getsize(self.path), 0)
+        writer.append('volume', 32, 102.0)
+        writer.append('volume', 33, 103.0)
+        self.assertEqual(os.path.getsize(self.path),
+                         4 * history.RECORD.size)
+        writer.close()
+
+    def test_text_variables_are_not_stored(self):
+        writer = HistoryWriter(self.path, fsync=False)
+        self.assertFalse(writer.append('inputname', 'MEDIA', 100.0))
+        writer.close()
+        self.assertEqual(len(query(self.path)['time']), 0)
+
+    def test_query_time_range_and_variables(self):
+        writer = HistoryWriter(self.path, fsync=False)
+        for second in range(10):
+            writer.append('volume', 20 + second, 100.0 + second)
+            writer.append('mute', second % 2, 100.5 + second)
+        writer.close()
+        columns = query(self.path, start=102.0, end=104.0,
+                        variables=['volume'])
+        self.assertEqual(list(columns['time']), [102.0, 103.0, 104.0])
+        self.assertEqual(list(columns['value']), [22, 23, 24])
+        self.assertEqual(set(columns['variable']),
+                         set([history.VARIABLES['volume']]))
+
+    def test_rotated_files_are_queried_in_order(self):
+        writer = HistoryWriter(self.path, max_bytes=3 * history.RECORD.size,
+                               backup_count=2, batch_records=1, fsync=False)
+        for second in range(10):
+            writer.append('power', second % 2, 100.0 + second)
+        writer.close()
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        # The oldest three records were rotated out
+        self.assertEqual(list(query(self.path)['time']),
+                         [103.0 + second for second in range(7)])
+
+    def test_torn_record_is_dropped_on_open(self):
+        writer = HistoryWriter(self.path, fsync=False)
+        writer.append('volume', 30, 100.0)
+        writer.close()
+        with open(self.path, 'ab') as fh:
+            fh.write(history.RECORD.pack(101.0, 3, 31)[:5])
+        writer = HistoryWriter(self.path, fsync=False)
+        writer.append('volume', 32, 102.0)
+        writer.close()
+        columns = query(self.path)
+        self.assertEqual(list(columns['time']), [100.0, 102.0])
+        self.assertEqual(list(columns['value']), [30, 32])
+
+    def test_timestamps_never_decrease(self):
+        writer = HistoryWriter(self.path, fsync=False)
+        writer.append('volume', 30, 100.0)
+        writer.close()
+        # The wall clock was set back, e.g. by NTP after boot
+        writer = HistoryWriter(self.path, fsync=False)
+        writer.append('volume', 31, 50.0)
+        writer.close()
+        self.assertEqual(list(query(self.path)['time']), [100.0, 100.0])
+        self.assertEqual(list(query(self.path, start=100.0)['value']),
+                         [30, 31])
@@ -0,0 +1,167 @@
+from __future__ import absolute_import, unicode_literals
+
+import json
+import threading
+import unittest
+
+from concurrent.futures import Future
+
+try:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import HTTPError, Request, urlopen
+
+from primare_control import http_api
+from primare_control.primare_control import PrimareTimeoutError
+from primare_control.runtime import RUNTIME
+
+
+class FakeController(object):
+    """Just the parts of PrimareController used by the HTTP API."""
+
+    _runtime = RUNTIME
+
+    def __init__(self):
+        self._state = {'volume': 30}
+        self._state_version = 1
+        self._state_listeners = []
+
+    def change(self, **changes):
+        self._state.update(changes)
+        self._state_version += 1
+        for listener in self._state_listeners:
+            listener(self._state_version)
+
+    def volume_set(self, volume):
+        future = Future()
+        future.set_result(volume)
+        return future
+
+    def balance_set(self, balance):
+        raise AttributeError('Internal error')
+
+    def input_set(self, source):
+        raise KeyError(source)
+
+    def mute_set(self, mute):
+        # Like PrimareController, anything but True unmutes
+        future = Future()
+        future.set_result(mute is True)
+        return future
+
+    def volume_get(self):
+        future = Future()
+        future.set_exception(PrimareTimeoutError('No reply'))
+        return future
+
+
+class HttpApiTest(unittest.TestCase):
+
+    def setUp(self):
+        RUNTIME.attach()
+        self.addCleanup(RUNTIME.detach)
+        self.controller = FakeController()
+        self.port = RUNTIME.call(http_api.listen, self.controller, 0,
+                                 '127.0.0.1')
+        self.addCleanup(RUNTIME.call, self.port.stopListening)
+
+    def request(self, path, data=None, headers={}):
+        url = 'http://127.0.0.1:{}{}'.format(self.port.getHost().port, path)
+        try:
+            response = urlopen(Request(url, data=data, headers=headers),
+                               timeout=5)
+        except HTTPError as e:
+            return e.code, e.headers, e.read()
+        return response.getcode(), response.headers, response.read()
+
+    def test_state_with_etag(self):
+        code, headers, body = self.request('/state')
+        self.assertEqual(code, 200)
+        self.assertEqual(json.loads(body.decode('utf-8')),
+                         {'version': http_api.EPOCH + '-1',
+                          'state': {'volume': 30}})
+        code, _, _ = self.request('/state',
+                                  headers={'If-None-Match': headers['ETag']})
+        self.assertEqual(code, 304)
+
+    def test_poll_answers_at_once_for_old_version(self):
+        code, _, body = self.request(
+            '/state/poll?version={}-0'.format(http_api.EPOCH))
+        self.assertEqual(code, 200)
+        self.assertEqual(json.loads(body.decode('utf-8'))['version'],
+                         http_api.EPOCH + '-1')
+
+    def test_version_of_other_server_process_does_not_match(self):
+        code, _, _ = self.request('/state', headers={'If-None-Match': '"1"'})
+        self.assertEqual(code, 200)
+        code, _, _ = self.request('/state/poll?version=1')
+        self.assertEqual(code, 200)
+
+    def test_poll_waits_for_change(self):
+        replies = []
+        thread = threading.Thread(target=lambda: replies.append(
+            self.request('/state/poll?version={}-1'.format(
+                http_api.EPOCH))))
+        thread.start()
+        # Wait until the request is parked before changing the state
+        poll = self.controller._state_listeners[0].__self__
+        while not RUNTIME.call(lambda: len(poll._waiting)):
+            thread.join(0.01)
+        RUNTIME.call(self.controller.change, volume=31)
+        thread.join(5)
+        code, _, body = replies[0]
+        self.assertEqual(code, 200)
+        self.assertEqual(json.loads(body.decode('utf-8')),
+                         {'version': http_api.EPOCH + '-2',
+                          'state': {'volume': 31}})
+
+    def test_poll_times_out(self):
+        poll = self.controller._state_listeners[0].__self__
+        poll._timeout = 0.05
+        code, _, _ = self.request(
+            '/state/poll?version={}-1'.format(http_api.EPOCH))
+        self.assertEqual(code, 304)
+
+    def test_command(self):
+        code, _, body = self.request('/command/volume_set?value=25', b'')
+        self.assertEqual(code, 200)
+        self.assertEqual(json.loads(body.decode('utf-8')),
+                         {'command': 'volume_set', 'reply': 25})
+
+    def test_command_json_body(self):
+        code, _, body = self.request('/command/volume_set',
+                                     b'{"value": 20}')
+        self.assertEqual(json.loads(body.decode('utf-8'))['reply'], 20)
+
+    def test_command_errors(self):
+        self.assertEqual(self.request('/command/close', b'')[0], 404)
+        self.assertEqual(self.request('/command/_write', b'')[0], 404)
+        self.assertEqual(
+            self.request('/command/recall_factory_settings', b'')[0], 404)
+        self.assertEqual(self.request('/command/volume_set', b'[20]')[0],
+                         400)
+        self.assertEqual(self.request('/command/volume_get', b'')[0], 504)
+        self.assertEqual(self.request('/command/input_set?value=Tape',
+                                      b'')[0], 400)
+        self.assertEqual(self.request('/command/balance_set?value=1',
+                                      b'')[0], 500)
+
+    def test_boolean_command_values(self):
+        for value, muted in [('1', True), ('on', True), ('true', True),
+                             ('0', False), ('off', False)]:
+            code, _, body = self.request(
+                '/command/mute_set?value=' + value, b'')
+            self.assertEqual(json.loads(body.decode('utf-8'))['reply'],
+                             muted, value)
+        code, _, body = self.request('/command/mute_set', b'{"value": true}')
+        self.assertTrue(json.loads(body.decode('utf-8'))['reply'])
+        self.assertEqual(self.request('/command/mute_set?value=loud',
+                                      b'')[0], 400)
+
+    def test_restarted_server_does_not_keep_old_listeners(self):
+        RUNTIME.call(self.port.stopListening)
+        self.assertEqual(self.controller._state_listeners, [])
+        port = RUNTIME.call(http_api.listen, self.controller, 0, '127.0.0.1')
+        self.addCleanup(RUNTIME.call, port.stopListening)
+        self.assertEqual(len(self.controller._state_listeners), 1)
@@ -0,0 +1,45 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from primare_control.input_index import InputNameIndex
+
+
+class InputNameIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'cache', 'inputs.json')
+
+    def test_resolve_numbers_and_names(self):
+        index = InputNameIndex(self.path)
+        index.update(6, 'MEDIA')
+        self.assertEqual(index.resolve(3), 3)
+        self.assertEqual(index.resolve('3'), 3)
+        self.assertEqual(index.resolve(' media '), 6)
+        self.assertRaises(KeyError, index.resolve, 'Turntable')
+
+    def test_names_persist_per_key(self):
+        InputNameIndex(self.path, key='/dev/ttyUSB0').update(1, 'Turntable')
+        InputNameIndex(self.path, key='/dev/ttyUSB1').update(1, 'CD')
+        self.assertEqual(InputNameIndex(self.path, key='/dev/ttyUSB0').names(),
+                         {1: 'Turntable'})
+        self.assertEqual(InputNameIndex(self.path, key='/dev/ttyUSB1').names(),
+                         {1: 'CD'})
+
+    def test_update_reports_changes_only(self):
+        index = InputNameIndex(self.path)
+        self.assertTrue(index.update(1, 'IN1'))
+        self.assertFalse(index.update(1, 'IN1'))
+        self.assertTrue(index.update(1, 'Turntable'))
+        self.assertRaises(KeyError, index.resolve, 'IN1')
+
+    def test_corrupt_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as fh:
+            fh.write('{')
+        self.assertEqual(len(InputNameIndex(self.path)), 0)
@@ -0,0 +1,246 @@
+from __future__ import absolute_import, unicode_literals
+
+import binascii
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from primare_control import primare_control
+from primare_control.primare_control import (
+    PrimareController,
+    PrimareTimeoutError
+)
+
+
+def make_controller(test, **kwargs):
+    """Return a PrimareController which never touches a serial port."""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    kwargs.setdefault('inputs_file', os.path.join(directory, 'inputs.json'))
+    kwargs.setdefault('runtime', mock.Mock())
+    controller = PrimareController(**kwargs)
+    controller._write = mock.Mock()
+    return controller
+
+
+class ControllerTestCase(unittest.TestCase):
+    """Base for tests of a controller without serial port or reactor."""
+
+    def setUp(self):
+        self.controller = make_controller(self)
+        self.reactor = self.controller._runtime.reactor
+
+    def at(self, seconds):
+        """Let the controller's clock read seconds within the with block."""
+        return mock.patch.object(primare_control, 'clock',
+                                 return_value=seconds)
+
+
+class ReplyFutureTest(ControllerTestCase):
+
+    def test_read_resolves_with_typed_value(self):
+        future = self.controller.volume_get()
+        self.assertFalse(future.done())
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual(future.result(0), 30)
+
+    def test_name_reply_is_text(self):
+        future = self.controller.modelname_get()
+        self.controller._handle_reply('16', '493232')
+        self.assertEqual(future.result(0), 'I22')
+
+    def test_inputname_strips_input_number(self):
+        future = self.controller.inputname_current_get()
+        self.controller._handle_reply('14', '06' + '4d45444941')
+        self.assertEqual(future.result(0), 'MEDIA')
+
+    def test_requests_to_different_variables_overlap(self):
+        volume = self.controller.volume_get()
+        mute = self.controller.mute_set(True)
+        self.controller._handle_reply('09', '01')
+        self.assertTrue(mute.result(0))
+        self.assertFalse(volume.done())
+        self.controller._handle_reply('03', '0a')
+        self.assertEqual(volume.result(0), 10)
+
+    def test_same_variable_resolves_in_send_order(self):
+        first = self.controller.volume_up()
+        second = self.controller.volume_up()
+        self.controller._handle_reply('03', '0b')
+        self.controller._handle_reply('03', '0c')
+        self.assertEqual(first.result(0), 11)
+        self.assertEqual(second.result(0), 12)
+
+    def test_timeout_fails_future(self):
+        future = self.controller.volume_get()
+        delay, expire, variable_char, pending, read = \
+            self.reactor.callFromThread.call_args[0][1:]
+        self.assertEqual(delay, self.controller._timeout)
+        expire(variable_char, pending, read)
+        self.assertRaises(PrimareTimeoutError, future.result, 0)
+
+    def test_late_reply_does_not_resolve_newer_request(self):
+        with self.at(100.0):
+            self.controller._expire_reply('03', self.controller.volume_up())
+            newer = self.controller.volume_down()
+            self.controller._handle_reply('03', '20')
+        self.assertFalse(newer.done())
+        self.controller._handle_reply('03', '1f')
+        self.assertEqual(newer.result(0), 31)
+        self.assertEqual(self.controller.metrics['late_replies'], 1)
+
+    def test_late_replies_are_only_awaited_for_a_transfer_time(self):
+        with self.at(100.0):
+            self.controller._expire_reply('03', self.controller.volume_up())
+        newer = self.controller.volume_down()
+        with self.at(100.5):
+            self.controller._handle_reply('03', '1f')
+        self.assertEqual(newer.result(0), 31)
+
+    def test_polling_recovers_from_a_lost_read_reply(self):
+        with self.at(100.0):
+            self.controller._expire_reply('03', self.controller.volume_get(),
+                                          read=True)
+        for second in range(1, 6):
+            poll = self.controller.volume_get()
+            with self.at(100.0 + second):
+                self.controller._handle_reply('03', '1e')
+            self.assertEqual(poll.result(0), 30)
+        self.assertEqual(self.controller.metrics['late_replies'], 0)
+
+    def test_polling_recovers_from_a_lost_write_reply(self):
+        with self.at(100.0):
+            self.controller._expire_reply('03', self.controller.volume_up())
+        for second in range(1, 6):
+            poll = self.controller.volume_get()
+            with self.at(100.0 + second):
+                self.controller._handle_reply('03', '1e')
+            self.assertEqual(poll.result(0), 30)
+
+    def test_command_without_reply_resolves_immediately(self):
+        self.assertIsNone(self.controller.power_on().result(0))
+
+    def test_ignored_values_still_return_a_future(self):
+        self.assertIsNone(self.controller.dim_set(-1).result(0))
+        self.assertFalse(self.controller._write.called)
+
+    def test_close_twice_detaches_once(self):
+        self.controller.close()
+        self.controller.close()
+        self.assertEqual(self.controller._runtime.detach.call_count, 1)
+
+
+class StateTest(ControllerTestCase):
+
+    def setUp(self):
+        super(StateTest, self).setUp()
+        self.controller._state_writer = mock.Mock()
+
+    def test_changes_are_published(self):
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual(self.controller._state, {'volume': 30})
+        self.assertEqual(self.controller._state_version, 1)
+        self.controller._state_writer.publish.assert_called_once_with(
+            {'volume': 30})
+
+    def test_unchanged_reply_is_not_published(self):
+        self.controller._handle_reply('03', '1e')
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual(self.controller._state_version, 1)
+
+    def test_inputname_updates_current_input(self):
+        self.controller._handle_reply('14', '06' + '4d45444941')
+        self.assertEqual(self.controller._state,
+                         {'input': 6, 'inputname': 'MEDIA'})
+
+    def test_changes_are_appended_to_history(self):
+        self.controller._history = mock.Mock()
+        self.controller._history.append.return_value = True
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual(self.controller._history.append.call_args[0][:2],
+                         ('volume', 30))
+        self.reactor.callLater.assert_called_once_with(
+            primare_control.FLUSH_INTERVAL, self.controller._history.flush)
+
+    def test_specific_inputname_is_not_current_state(self):
+        self.controller._handle_reply('94', '03' + '494e33')
+        self.assertEqual(self.controller._state, {})
+
+
+class InputNameTest(ControllerTestCase):
+
+    def test_inputnames_get_sends_all_requests_at_once(self):
+        future = self.controller.inputnames_get()
+        self.assertEqual(self.controller._write.call_count,
+                         PrimareController._INPUTS)
+        self.assertFalse(future.done())
+        for number in range(1, PrimareController._INPUTS + 1):
+            name = binascii.hexlify('IN{}'.format(number).encode('ascii'))
+            self.controller._handle_reply(
+                '94', '{:02x}{}'.format(number, name.decode('ascii')))
+        self.assertEqual(future.result(0)[6], 'IN6')
+        self.assertEqual(len(future.result(0)), PrimareController._INPUTS)
+
+    def test_input_set_by_name(self):
+        self.controller._handle_reply('94', '06' + '5475726e7461626c65')
+        self.controller.input_set('turntable')
+        self.controller._write.assert_any_call('W', '8206')
+
+    def test_changed_name_refreshes_index(self):
+        self.controller._handle_reply('94', '06' + '4d45444941')
+        self.controller._handle_reply('14', '06' + '5475726e7461626c65')
+        self.assertEqual(self.controller._inputs.resolve('Turntable'), 6)
+        self.assertRaises(KeyError, self.controller._inputs.resolve, 'MEDIA')
+
+
+class SingleFlightTest(ControllerTestCase):
+
+    def test_identical_reads_share_one_frame(self):
+        futures = [self.controller.volume_get() for _ in range(3)]
+        self.assertEqual(self.controller._write.call_count, 1)
+        self.assertEqual(self.controller.metrics['frames_saved'], 2)
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual([future.result(0) for future in futures],
+                         [30, 30, 30])
+
+    def test_read_after_reply_sends_new_frame(self):
+        self.controller.volume_get()
+        self.controller._handle_reply('03', '1e')
+        future = self.controller.volume_get()
+        self.assertEqual(self.controller._write.call_count, 2)
+        self.assertFalse(future.done())
+
+    def test_reads_with_different_options_are_not_shared(self):
+        self.controller.inputname_specific_get(1)
+        self.controller.inputname_specific_get(2)
+        self.assertEqual(self.controller._write.call_count, 2)
+
+    def test_read_after_write_is_not_shared(self):
+        before = self.controller.volume_get()
+        self.controller.volume_set(30)
+        after = self.controller.volume_get()
+        self.assertIsNot(after, before)
+        self.assertEqual(self.controller._write.call_count, 3)
+        self.controller._handle_reply('03', '14')
+        self.controller._handle_reply('03', '1e')
+        self.controller._handle_reply('03', '1e')
+        self.assertEqual(after.result(0), 30)
+
+    def test_inputname_after_input_change_is_not_shared(self):
+        self.controller.inputname_current_get()
+        self.controller.input_next()
+        self.assertEqual(self.controller._write.call_count, 3)
+        self.assertEqual(self.controller.metrics['frames_saved'], 0)
+
+    def test_writes_are_never_shared(self):
+        self.controller.volume_up()
+        self.controller.volume_up()
+        self.assertEqual(self.controller._write.call_count, 2)
+        self.assertEqual(self.controller.metrics['frames_sent'], 2)
+        self.assertEqual(self.controller.metrics['frames_saved'], 0)
@@ -0,0 +1,45 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from primare_control.primare_control import PrimareController
+from primare_control.runtime import RUNTIME
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), 'needs a pseudo terminal')
+class RuntimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, slave)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.inputs_file = os.path.join(directory, 'inputs.json')
+
+    def open_controller(self):
+        return PrimareController(port=self.port,
+                                 inputs_file=self.inputs_file)
+
+    def test_controllers_can_be_reopened(self):
+        attached = RUNTIME.attached
+        controller = self.open_controller()
+        thread = RUNTIME._thread
+        for _ in range(100):
+            controller.close()
+            controller = self.open_controller()
+        self.assertIs(RUNTIME._thread, thread)
+        self.assertTrue(thread.is_alive())
+        controller.close()
+        self.assertEqual(RUNTIME.attached, attached)
+
+    def test_close_releases_port(self):
+        controller = self.open_controller()
+        protocol = controller._serial_protocol
+        controller.close()
+        self.assertTrue(protocol._disconnected.called)
+        self.assertFalse(protocol.transport.connected)
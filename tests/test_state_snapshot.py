@@ -0,0 +1,70 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from primare_control import state_snapshot
+from primare_control.state_snapshot import (
+    StateSnapshotReader,
+    StateSnapshotWriter,
+    read_snapshot
+)
+
+
+class StateSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'state')
+        self.writer = StateSnapshotWriter(self.path)
+        self.addCleanup(self.writer.close)
+
+    def test_unknown_values_before_first_publish(self):
+        snapshot = read_snapshot(self.path)
+        self.assertEqual(snapshot.version, 0)
+        self.assertIsNone(snapshot.volume)
+        self.assertIsNone(snapshot.power)
+
+    def test_reader_sees_published_state(self):
+        reader = StateSnapshotReader(self.path)
+        self.addCleanup(reader.close)
+        self.writer.publish({'power': True, 'input': 6, 'volume': 30,
+                             'mute': False, 'inputname': 'MEDIA'})
+        snapshot = reader.read()
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual((snapshot.power, snapshot.input, snapshot.volume,
+                          snapshot.mute, snapshot.inputname),
+                         (True, 6, 30, False, 'MEDIA'))
+        self.writer.publish({'volume': 31})
+        self.assertEqual(reader.read().version, 2)
+        self.assertEqual(reader.read().volume, 31)
+
+    def test_new_writer_continues_version(self):
+        self.writer.publish({'volume': 30})
+        writer = StateSnapshotWriter(self.path)
+        self.addCleanup(writer.close)
+        writer.publish({'volume': 31})
+        self.assertEqual(read_snapshot(self.path).version, 2)
+
+    def test_reader_gives_up_on_unfinished_write(self):
+        struct.pack_into('<I', self.writer._mmap, state_snapshot.SEQ_OFFSET,
+                         1)
+        self.assertRaises(RuntimeError, read_snapshot, self.path)
+
+    def test_rejects_foreign_file(self):
+        path = os.path.join(self.directory, 'other')
+        with open(path, 'wb') as fh:
+            fh.write(b'\0' * state_snapshot.SNAPSHOT_SIZE)
+        self.assertRaises(ValueError, StateSnapshotReader, path)
+
+    def test_writer_does_not_overwrite_foreign_file(self):
+        path = os.path.join(self.directory, 'notes.txt')
+        with open(path, 'wb') as fh:
+            fh.write(b'Precious user data')
+        self.assertRaises(ValueError, StateSnapshotWriter, path)
+        with open(path, 'rb') as fh:
+            self.assertEqual(fh.read(), b'Precious user data')
@@ -0,0 +1,46 @@
+from __future__ import absolute_import, unicode_literals
+
+import threading
+import unittest
+
+from primare_control.timings import Timings
+
+
+class TimingsTest(unittest.TestCase):
+
+    def test_phases_accumulate_in_first_seen_order(self):
+        timings = Timings()
+        timings.add('serial port open', 0.25)
+        timings.add('write pacing sleep', 0.05)
+        timings.add('write pacing sleep', 0.05)
+        self.assertEqual(timings.phases(),
+                         [('serial port open', 1, 0.25),
+                          ('write pacing sleep', 2, 0.1)])
+
+    def test_phase_is_recorded_on_error(self):
+        timings = Timings()
+        with self.assertRaises(ValueError):
+            with timings.phase('setup'):
+                raise ValueError()
+        self.assertEqual(timings.phases()[0][:2], ('setup', 1))
+
+    def test_report_lists_every_phase(self):
+        timings = Timings()
+        with timings.phase('close'):
+            pass
+        report = timings.report()
+        self.assertIn('close', report)
+        self.assertIn('total since start', report)
+
+    def test_concurrent_phases_are_all_counted(self):
+        timings = Timings()
+
+        def record():
+            for _ in range(2000):
+                timings.add('write pacing sleep', 0.0)
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(timings.phases()[0][1], 16000)
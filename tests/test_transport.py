@@ -0,0 +1,87 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from primare_control.primare_control import PrimareController
+from primare_control.transport import parse_port
+
+VOLUME_GET = b'\x02\x57\x03\x00\x10\x03'
+VOLUME_REPLY = b'\x02\x03\x1e\x10\x03'
+
+
+class ParsePortTest(unittest.TestCase):
+
+    def test_plain_ports_are_serial(self):
+        self.assertEqual(parse_port('/dev/ttyUSB0'),
+                         ('serial', '/dev/ttyUSB0'))
+        self.assertEqual(parse_port(3), ('serial', 3))
+        self.assertEqual(parse_port('serial:///dev/ttyACM0'),
+                         ('serial', '/dev/ttyACM0'))
+
+    def test_pty_and_tcp_urls(self):
+        self.assertEqual(parse_port('pty:///dev/pts/5'),
+                         ('pty', '/dev/pts/5'))
+        self.assertEqual(parse_port('tcp://bridge.local:4001'),
+                         ('tcp', ('bridge.local', 4001)))
+
+    def test_invalid_urls(self):
+        self.assertRaises(ValueError, parse_port, 'tcp://bridge.local')
+        self.assertRaises(ValueError, parse_port, 'udp://bridge.local:4001')
+
+
+class AmplifierTransportTest(unittest.TestCase):
+    """Talk to a stand-in amplifier answering volume_get."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.inputs_file = os.path.join(directory, 'inputs.json')
+
+    def assert_volume_get(self, port, read, write):
+        def amplifier():
+            frame = b''
+            while not frame.endswith(b'\x10\x03'):
+                frame += read()
+            self.received = frame
+            write(VOLUME_REPLY)
+        thread = threading.Thread(target=amplifier)
+        thread.start()
+        controller = PrimareController(port=port,
+                                       inputs_file=self.inputs_file)
+        try:
+            self.assertEqual(controller.volume_get().result(5), 30)
+        finally:
+            controller.close()
+            thread.join()
+        self.assertTrue(self.received.startswith(VOLUME_GET))
+
+    def test_tcp(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        connection = []
+
+        def read():
+            if not connection:
+                connection.append(server.accept()[0])
+                self.addCleanup(connection[0].close)
+            return connection[0].recv(64)
+
+        self.assert_volume_get(
+            'tcp://127.0.0.1:{}'.format(server.getsockname()[1]),
+            read, lambda data: connection[0].sendall(data))
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), 'needs a pseudo terminal')
+    def test_pty(self):
+        master, slave = os.openpty()
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        self.assert_volume_get('pty://' + os.ttyname(slave),
+                               lambda: os.read(master, 64),
+                               lambda data: os.write(master, data))